@@ -0,0 +1,121 @@
+"""Low-stock alerting.
+
+Checkout detects reorder-level crossings from the quantities it already holds
+and queues ``open_low_stock_alerts``; alerts are debounced per product and
+mailed as one digest per supplier by ``manage.py low_stock_digest``.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import User, Product, LowStockAlert
+from .tasks import task
+
+
+def crossed_reorder_level(product, old_quantity, new_quantity):
+    return old_quantity > product.reorder_level >= new_quantity
+
+
+@task(batch=True)
+def open_low_stock_alerts(payloads):
+    product_ids = {pid for payload in payloads for pid in payload['product_ids']}
+    open_alerts(product_ids)
+
+
+def debounce():
+    return timedelta(seconds=getattr(settings, 'LOW_STOCK_ALERT_DEBOUNCE', 6 * 60 * 60))
+
+
+def open_alerts(product_ids):
+    # Only products that are still low by the time the task runs
+    low = dict(
+        Product.objects.filter(id__in=product_ids, quantity__lte=F('reorder_level'))
+        .values_list('id', 'quantity')
+    )
+    if not low:
+        return
+    now = timezone.now()
+    existing = LowStockAlert.objects.in_bulk(list(low), field_name='product_id')
+
+    updated = []
+    for product_id, alert in existing.items():
+        if not alert.is_open:
+            alert.is_open = True
+            alert.triggered_at = now
+            alert.resolved_at = None
+            # Flapping around the reorder level doesn't notify again within the debounce window
+            if alert.notified_at and now - alert.notified_at >= debounce():
+                alert.notified_at = None
+        alert.quantity = low[product_id]
+        updated.append(alert)
+    LowStockAlert.objects.bulk_update(updated, ['is_open', 'triggered_at', 'resolved_at', 'notified_at', 'quantity'])
+    LowStockAlert.objects.bulk_create([
+        LowStockAlert(product_id=product_id, quantity=quantity, triggered_at=now)
+        for product_id, quantity in low.items() if product_id not in existing
+    ])
+
+
+def sync_product(product):
+    """Open or resolve the alert of a product after a manual stock change."""
+    if product.is_low_stock:
+        open_alerts([product.id])
+    else:
+        LowStockAlert.objects.filter(product=product, is_open=True).update(is_open=False, resolved_at=timezone.now())
+
+
+def pending_digest():
+    """Open, not yet notified alerts grouped by supplier, in a single query.
+
+    An alert reopened within the debounce window keeps its ``notified_at``;
+    it is reported again once the window has passed.
+    """
+    reopened = Q(notified_at__lt=F('triggered_at'), notified_at__lte=timezone.now() - debounce())
+    rows = (
+        LowStockAlert.objects.filter(Q(notified_at__isnull=True) | reopened, is_open=True)
+        .order_by('product__supplier__name', 'product__name')
+        .values(
+            'id', 'triggered_at',
+            'product__name', 'product__sku', 'product__quantity', 'product__reorder_level',
+            'product__supplier_id', 'product__supplier__name', 'product__supplier__phone',
+        )
+    )
+    digest = defaultdict(list)
+    for row in rows:
+        digest[(row['product__supplier_id'], row['product__supplier__name'] or 'No supplier')].append(row)
+    return digest
+
+
+def format_digest(supplier_name, rows):
+    lines = [f"Low stock items from {supplier_name}:", ""]
+    for row in rows:
+        lines.append(
+            f"- {row['product__name']} ({row['product__sku']}): "
+            f"{row['product__quantity']} left, reorder level {row['product__reorder_level']}"
+        )
+    if rows[0]['product__supplier__phone']:
+        lines += ["", f"Supplier phone: {rows[0]['product__supplier__phone']}"]
+    return '\n'.join(lines)
+
+
+def send_digest(recipients=None):
+    if recipients is None:
+        recipients = getattr(settings, 'LOW_STOCK_ALERT_EMAILS', None) or list(
+            User.objects.filter(role__in=['admin', 'manager'], is_active=True)
+            .exclude(email='').values_list('email', flat=True)
+        )
+    digest = pending_digest()
+    if not digest or not recipients:
+        return 0
+    messages = [
+        (f"Low stock: {len(rows)} item(s) from {supplier_name}", format_digest(supplier_name, rows),
+         None, recipients)
+        for (_, supplier_name), rows in digest.items()
+    ]
+    send_mass_mail(messages)
+    alert_ids = [row['id'] for rows in digest.values() for row in rows]
+    LowStockAlert.objects.filter(id__in=alert_ids).update(notified_at=timezone.now())
+    return len(alert_ids)
@@ -0,0 +1,124 @@
+"""Gross margin analytics over sale lines.
+
+All the heavy lifting is one GROUP BY per table in the database; Python only
+sees one row per group (product, category, staff member or day), so memory
+stays bounded by the number of groups, not of sale lines. Archived sales are
+aggregated the same way and merged in, so reports don't change when old
+sales are archived. Costs are the unit_cost snapshotted on each line, so
+later cost changes or deleted products don't rewrite past margins.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import SaleItem, ArchivedSaleItem
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+CENT = Decimal('0.01')
+
+# dimension -> (group key, label)
+DIMENSIONS = {
+    'product': ('product_id', Max('product_name')),
+    'category': ('product__category_id', Max('product__category__name')),
+    'staff': ('sale__staff_id', Max('sale__staff__username')),
+    'day': (TruncDate('sale__created_at'), None),
+}
+
+
+def aggregate(model, dimension, start, end):
+    key, label = DIMENSIONS[dimension]
+    # Compare against datetimes, not __date, so the created_at index can be used
+    lines = model.objects.filter(
+        sale__created_at__gte=timezone.make_aware(datetime.combine(start, time.min)),
+        sale__created_at__lt=timezone.make_aware(datetime.combine(end, time.min)),
+    )
+    if isinstance(key, str):
+        lines = lines.values(group=F(key))
+    else:
+        lines = lines.annotate(group=key).values('group')
+    lines = lines.annotate(
+        label=label if label is not None else Value(''),
+        # Cost comes from the unit_cost snapshot, not the product's current cost.
+        # Annotated before quantity, so F('quantity') is still the column.
+        cost=Coalesce(
+            Sum(ExpressionWrapper(F('quantity') * F('unit_cost'), output_field=MONEY)),
+            Value(Decimal(0)),
+            output_field=MONEY,
+        ),
+        quantity=Sum('quantity'),
+        lines=Count('id'),
+        revenue=Coalesce(Sum('total'), Value(Decimal(0)), output_field=MONEY),
+    ).order_by()
+    return lines
+
+
+def margins(dimension, start, end):
+    """Revenue, cost and margin per group for sales in [start, end)."""
+    groups = {}
+    for model in (SaleItem, ArchivedSaleItem):
+        for row in aggregate(model, dimension, start, end):
+            current = groups.setdefault(row['group'], {
+                'key': row['group'], 'label': row['label'] or '', 'quantity': 0, 'lines': 0,
+                'revenue': Decimal(0), 'cost': Decimal(0),
+            })
+            for field in ('quantity', 'lines', 'revenue', 'cost'):
+                current[field] += row[field]
+    for row in groups.values():
+        row['revenue'] = row['revenue'].quantize(CENT)
+        row['cost'] = row['cost'].quantize(CENT)
+        row['margin'] = row['revenue'] - row['cost']
+        row['margin_pct'] = round(row['margin'] / row['revenue'] * 100, 2) if row['revenue'] else None
+    return list(groups.values())
+
+
+def classify_abc(rows, metric='revenue', a=Decimal('0.8'), b=Decimal('0.95')):
+    """Tag rows A/B/C by their cumulative share of ``metric``, best first."""
+    rows = sorted(rows, key=lambda row: row[metric], reverse=True)
+    total = sum((row[metric] for row in rows if row[metric] > 0), Decimal(0))
+    running = Decimal(0)
+    for row in rows:
+        # Share covered by the groups ranked above this one
+        share = running / total if total else Decimal(1)
+        row['abc'] = 'A' if share < a else 'B' if share < b else 'C'
+        running += max(row[metric], Decimal(0))
+    return rows
+
+
+def compare(current, previous):
+    """Add period-over-period deltas of ``previous`` to the rows of ``current``."""
+    before = {row['key']: row for row in previous}
+    for row in current:
+        old = before.get(row['key'])
+        for field in ('revenue', 'margin'):
+            old_value = old[field] if old else Decimal(0)
+            row[f'{field}_delta'] = row[field] - old_value
+            row[f'{field}_change_pct'] = round((row[field] - old_value) / old_value * 100, 2) if old_value else None
+    return current
+
+
+def report(dimension, start, end, top=None, order_by='margin', with_comparison=False, with_abc=False):
+    rows = margins(dimension, start, end)
+    if with_comparison:
+        previous_start = start - (end - start)
+        rows = compare(rows, margins(dimension, previous_start, start))
+    if with_abc:
+        rows = classify_abc(rows)
+    if dimension == 'day':
+        rows.sort(key=lambda row: row['key'])
+    else:
+        # Groups without revenue have no margin_pct; rank them last
+        rows.sort(key=lambda row: (row[order_by] is not None, row[order_by] or 0), reverse=True)
+    totals = {
+        'revenue': sum((row['revenue'] for row in rows), Decimal(0)),
+        'cost': sum((row['cost'] for row in rows), Decimal(0)),
+    }
+    totals['margin'] = totals['revenue'] - totals['cost']
+    return {'rows': rows[:top] if top else rows, 'totals': totals, 'groups': len(rows)}
+
+
+def default_period(days=30, today=None):
+    end = (today or timezone.localdate()) + timedelta(days=1)
+    return end - timedelta(days=days), end
@@ -0,0 +1,338 @@
+"""Read-only JSON API for the catalog, sales and payments.
+
+Every list endpoint supports:
+
+* ``?fields=id,name,price`` - only return (and only SELECT) these fields
+* ``?after=<id>&limit=<n>`` - keyset pagination on the primary key
+* ``If-None-Match`` - 304 when nothing in the filtered set changed
+
+Rows are serialized straight from ``.values()``, no model instances are built.
+"""
+import hashlib
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, Q
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET
+
+from . import analytics
+from .images import variant_url
+from .models import Product, ProductTombstone, Category, Supplier, Sale, Payment
+from .routers import use_replica, read_alias
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+SYNC_FIELDS = ['id', 'name', 'sku', 'category', 'price', 'effective_price', 'deal_buy_quantity', 'deal_free_quantity',
+               'quantity', 'reorder_level', 'thumbnail', 'updated_at']
+SYNC_CHUNK_SIZE = 1000
+# Rows newer than this are left for the next sync, so a transaction that
+# commits late with an older updated_at can't slip behind a client's cursor.
+SYNC_SAFETY_LAG = timedelta(seconds=2)
+
+
+def image_url(path):
+    return default_storage.url(path) if path else None
+
+
+class Resource:
+    """Describes one endpoint: its public field names and the columns behind them."""
+
+    def __init__(self, queryset, fields, default_fields, filters=None, admin_fields=(), version_field='updated_at',
+                 converters=None, joined_versions=None):
+        self.queryset = queryset
+        self.fields = fields  # public name -> .values() lookup
+        self.default_fields = default_fields
+        self.filters = filters or {}  # query parameter -> ORM lookup
+        self.admin_fields = set(admin_fields)
+        self.version_field = version_field
+        self.converters = converters or {}
+        self.joined_versions = joined_versions or {}  # public name of a joined field -> version of its table
+
+    def allowed_fields(self, user):
+        if user.is_superuser or user.role == 'admin':
+            return list(self.fields)
+        return [name for name in self.fields if name not in self.admin_fields]
+
+    def filter(self, request):
+        queryset = self.queryset
+        for param, lookup in self.filters.items():
+            value = request.GET.get(param)
+            if value not in (None, ''):
+                queryset = queryset.filter(**{lookup: value})
+        return queryset
+
+    def etag(self, queryset, request, fields):
+        # One aggregate over the filtered set: any insert, delete or update
+        # changes the count or the newest version, of this table or of the
+        # joined rows the selected fields come from.
+        versions = {f'version_{name}': Max(self.joined_versions[name]) for name in fields if name in self.joined_versions}
+        state = queryset.order_by().aggregate(count=Count('id'), version=Max(self.version_field), **versions)
+        joined = ':'.join(str(state[name]) for name in versions)
+        key = f"{state['count']}:{state['version']}:{joined}:{','.join(fields)}:{request.GET.urlencode()}"
+        return '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+    def serialize(self, rows, fields):
+        converters = [(name, self.converters[name]) for name in fields if name in self.converters]
+        results = []
+        for row in rows:
+            item = {name: row[self.fields[name]] for name in fields}
+            for name, convert in converters:
+                item[name] = convert(item[name])
+            results.append(item)
+        return results
+
+
+RESOURCES = {
+    'products': Resource(
+        Product.objects.all(),
+        fields={
+            'id': 'id', 'name': 'name', 'sku': 'sku', 'description': 'description',
+            'category': 'category_id', 'category_name': 'category__name',
+            'supplier': 'supplier_id', 'supplier_name': 'supplier__name',
+            'price': 'price', 'cost_price': 'cost_price', 'quantity': 'quantity',
+            # Price after promotions and the buy-X-get-Y deal, see prices.py
+            'effective_price': 'effective_price__price', 'deal_buy_quantity': 'effective_price__buy_quantity',
+            'deal_free_quantity': 'effective_price__free_quantity',
+            'reorder_level': 'reorder_level', 'image': 'image',
+            'thumbnail': 'image_variants', 'thumbnail_webp': 'image_variants', 'medium': 'image_variants',
+            'medium_webp': 'image_variants', 'created_at': 'created_at', 'updated_at': 'updated_at',
+        },
+        default_fields=['id', 'name', 'sku', 'price', 'quantity', 'image', 'thumbnail'],
+        filters={'q': 'name__icontains', 'category': 'category_id', 'supplier': 'supplier_id',
+                 'updated_since': 'updated_at__gt'},
+        admin_fields=['cost_price'],
+        converters={
+            'image': image_url,
+            'thumbnail': lambda variants: variant_url(variants, 'thumb'),
+            'thumbnail_webp': lambda variants: variant_url(variants, 'thumb_webp'),
+            'medium': lambda variants: variant_url(variants, 'medium'),
+            'medium_webp': lambda variants: variant_url(variants, 'medium_webp'),
+        },
+        joined_versions={'category_name': 'category__updated_at', 'supplier_name': 'supplier__updated_at'},
+    ),
+    'categories': Resource(
+        Category.objects.all(),
+        fields={'id': 'id', 'name': 'name', 'description': 'description',
+                'created_at': 'created_at', 'updated_at': 'updated_at'},
+        default_fields=['id', 'name'],
+    ),
+    'suppliers': Resource(
+        Supplier.objects.all(),
+        fields={'id': 'id', 'name': 'name', 'contact_person': 'contact_person', 'email': 'email',
+                'phone': 'phone', 'address': 'address', 'created_at': 'created_at', 'updated_at': 'updated_at'},
+        default_fields=['id', 'name', 'phone'],
+    ),
+    'sales': Resource(
+        Sale.objects.all(),
+        fields={
+            'id': 'id', 'invoice_number': 'invoice_number', 'staff': 'staff_id',
+            'customer_name': 'customer_name', 'customer_phone': 'customer_phone',
+            'subtotal': 'subtotal', 'discount': 'discount', 'total': 'total',
+            'amount_paid': 'amount_paid', 'balance': 'balance', 'payment_status': 'payment_status',
+            'created_at': 'created_at', 'updated_at': 'updated_at',
+        },
+        default_fields=['id', 'invoice_number', 'customer_name', 'total', 'balance', 'payment_status', 'created_at'],
+        filters={'status': 'payment_status', 'staff': 'staff_id', 'since': 'created_at__gte',
+                 'until': 'created_at__lt'},
+    ),
+    'payments': Resource(
+        Payment.objects.all(),
+        fields={
+            'id': 'id', 'sale': 'sale_id', 'invoice_number': 'sale__invoice_number', 'amount': 'amount',
+            'payment_method': 'payment_method', 'reference': 'reference', 'notes': 'notes',
+            'created_by': 'created_by_id', 'created_at': 'created_at',
+        },
+        default_fields=['id', 'sale', 'amount', 'payment_method', 'created_at'],
+        filters={'sale': 'sale_id', 'method': 'payment_method', 'since': 'created_at__gte'},
+        # Payments are never edited, the newest id is enough to version them
+        version_field='id',
+    ),
+}
+
+
+def error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+@use_replica
+@gzip_page
+@require_GET
+@login_required
+def resource_list(request, resource):
+    spec = RESOURCES[resource]
+    allowed = spec.allowed_fields(request.user)
+
+    if request.GET.get('fields'):
+        fields = [name.strip() for name in request.GET['fields'].split(',') if name.strip()]
+        unknown = [name for name in fields if name not in allowed]
+        if unknown:
+            return error(f"Unknown field(s): {', '.join(unknown)}")
+        if 'id' not in fields:
+            fields.insert(0, 'id')  # Needed for the next cursor
+    else:
+        fields = [name for name in spec.default_fields if name in allowed]
+
+    try:
+        limit = min(int(request.GET.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        after = int(request.GET['after']) if request.GET.get('after') else None
+    except ValueError:
+        return error('limit and after must be integers')
+    if limit < 1:
+        return error('limit must be positive')
+
+    try:
+        queryset = spec.filter(request)
+        etag = spec.etag(queryset, request, fields)
+    except (ValueError, ValidationError):
+        return error('Invalid filter value')
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    rows = list(queryset.order_by('id').values(*{spec.fields[name] for name in fields})[:limit + 1])
+    has_more = len(rows) > limit
+    results = spec.serialize(rows[:limit], fields)
+
+    response = JsonResponse(
+        {'results': results, 'next': results[-1]['id'] if has_more else None},
+        json_dumps_params={'separators': (',', ':')},
+    )
+    response['ETag'] = etag
+    # Clients keep their copy but must revalidate it every time
+    patch_cache_control(response, private=True, no_cache=True)
+    # Sessions come in a cookie, POS terminals send a token instead
+    patch_vary_headers(response, ['Cookie', 'Authorization'])
+    return response
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(updated_at, product_id, tombstone_id):
+    # Integer microseconds keep the cursor exact, floats would round
+    micros = (updated_at - EPOCH) // timedelta(microseconds=1) if updated_at else 0
+    return f"{micros}.{product_id}.{tombstone_id}"
+
+
+def decode_cursor(cursor):
+    micros, product_id, tombstone_id = (int(part) for part in cursor.split('.'))
+    updated_at = EPOCH + timedelta(microseconds=micros) if micros else None
+    return updated_at, product_id, tombstone_id
+
+
+def change_feed(updated_at, product_id, tombstone_id, upper, using='default'):
+    """Yield NDJSON lines: changed products, then deleted ids, then the next cursor."""
+    spec = RESOURCES['products']
+    columns = {spec.fields[name] for name in SYNC_FIELDS}
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    products = Product.objects.using(using).filter(updated_at__lte=upper).order_by('updated_at', 'id')
+    while True:
+        chunk = products
+        if updated_at is not None:
+            chunk = chunk.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=product_id))
+        rows = list(chunk.values(*columns)[:SYNC_CHUNK_SIZE])
+        if rows:
+            yield ''.join(encoder.encode({'product': item}) + '\n' for item in spec.serialize(rows, SYNC_FIELDS))
+            updated_at, product_id = rows[-1]['updated_at'], rows[-1]['id']
+        if len(rows) < SYNC_CHUNK_SIZE:
+            break
+
+    while True:
+        ids = list(
+            ProductTombstone.objects.using(using).filter(id__gt=tombstone_id).order_by('id')
+            .values_list('id', 'product_id')[:SYNC_CHUNK_SIZE]
+        )
+        if ids:
+            yield ''.join(encoder.encode({'deleted': pid}) + '\n' for _, pid in ids)
+            tombstone_id = ids[-1][0]
+        if len(ids) < SYNC_CHUNK_SIZE:
+            break
+
+    yield encoder.encode({'cursor': encode_cursor(updated_at, product_id, tombstone_id)}) + '\n'
+
+
+async def async_change_feed(*args, **kwargs):
+    """change_feed() for ASGI, which would otherwise read a sync iterator to the end before sending it."""
+    lines = change_feed(*args, **kwargs)
+    # Thread sensitive: every chunk is fetched on the same thread, with the same connection
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(lines, None)) is not None:
+        yield chunk
+
+
+@use_replica
+@gzip_page
+@require_GET
+@login_required
+def product_changes(request):
+    """Catalog changes since ``?cursor=``, or the whole catalog without one.
+
+    The response is streamed as newline-delimited JSON so the first full
+    sync never has to fit in memory on either side. Clients upsert every
+    ``product`` line, drop every ``deleted`` id and keep the final ``cursor``
+    for their next call.
+    """
+    if request.GET.get('cursor'):
+        try:
+            updated_at, product_id, tombstone_id = decode_cursor(request.GET['cursor'])
+        except (ValueError, OverflowError):
+            return error('Invalid cursor')
+    else:
+        # Full sync: every live product, and no need to replay old deletions
+        updated_at, product_id = None, 0
+        tombstone_id = ProductTombstone.objects.aggregate(Max('id'))['id__max'] or 0
+
+    upper = timezone.now() - SYNC_SAFETY_LAG
+    # Each server streams its own kind of iterator, the other kind would be read whole into memory
+    feed = async_change_feed if isinstance(request, ASGIRequest) else change_feed
+    response = StreamingHttpResponse(
+        # The body is generated after the view returns, so pass the read alias along
+        feed(updated_at, product_id, tombstone_id, upper, using=read_alias()),
+        content_type='application/x-ndjson',
+    )
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+@use_replica
+@gzip_page
+@require_GET
+@login_required
+@user_passes_test(lambda user: user.is_superuser or user.role == 'admin')
+def margin_report(request):
+    """Gross margin report, see analytics.report() for the parameters."""
+    dimension = request.GET.get('by', 'product')
+    order_by = request.GET.get('order', 'margin')
+    if dimension not in analytics.DIMENSIONS:
+        return error(f"by must be one of {', '.join(analytics.DIMENSIONS)}")
+    if order_by not in ('margin', 'revenue', 'margin_pct', 'quantity'):
+        return error('order must be margin, revenue, margin_pct or quantity')
+    try:
+        start, end = analytics.default_period(int(request.GET.get('days', 30)))
+        if request.GET.get('start'):
+            start = date.fromisoformat(request.GET['start'])
+            end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else end
+        top = int(request.GET['top']) if request.GET.get('top') else None
+    except ValueError:
+        return error('Invalid days, top, start or end')
+    if start >= end:
+        return error('start must be before end')
+
+    result = analytics.report(
+        dimension, start, end, top=top, order_by=order_by,
+        with_comparison=request.GET.get('compare') == '1', with_abc=request.GET.get('abc') == '1',
+    )
+    result.update(by=dimension, start=start, end=end)
+    return JsonResponse(result, json_dumps_params={'separators': (',', ':')})
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class InventoryappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventoryApp'
+
+    def ready(self):
+        # Register background task handlers, signal receivers and system checks
+        from . import tasks, alerts, images, audit, auth, signals  # noqa: F401
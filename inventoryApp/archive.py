@@ -0,0 +1,101 @@
+"""Archival of closed sales.
+
+Each batch copies fully paid sales older than the horizon, with their items,
+payments and stock movements, into the archive tables and deletes the
+originals in the same transaction. Debt reminders are not archived: the
+sales are paid, so their reminders are deleted with them. A crash loses at most the batch in
+flight, which is rolled back, so the command can simply be run again.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import F, Sum
+
+from . import caching
+from .models import (Sale, SaleItem, Payment, StockMovement, DebtReminder, ArchivedSale, ArchivedSaleItem,
+                     ArchivedPayment, ArchivedStockMovement, ArchivedDailyTotal)
+
+# Archive model -> (hot model, columns copied as-is)
+COPIES = [
+    (ArchivedSale, Sale, ['id', 'invoice_number', 'staff_id', 'customer_name', 'customer_phone', 'subtotal',
+                          'discount', 'total', 'amount_paid', 'balance', 'payment_status', 'created_at',
+                          'updated_at']),
+    (ArchivedSaleItem, SaleItem, ['id', 'sale_id', 'product_id', 'product_name', 'quantity', 'price', 'discount',
+                                  'total', 'unit_cost']),
+    (ArchivedPayment, Payment, ['id', 'sale_id', 'amount', 'payment_method', 'reference', 'notes', 'created_at',
+                                'created_by_id']),
+    (ArchivedStockMovement, StockMovement, ['id', 'product_id', 'movement_type', 'quantity', 'reference', 'notes',
+                                            'created_by_id', 'created_at']),
+]
+
+
+def candidates(horizon):
+    return Sale.objects.filter(payment_status='paid', balance__lte=0, created_at__lt=horizon)
+
+
+def delete_ids(model, ids, field='id'):
+    # Raw DELETE: the ORM would load every row to send delete signals
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.get_field(field).column)
+    with connection.cursor() as cursor:
+        # Stay under SQLite's limit on query parameters
+        for start in range(0, len(ids), 900):
+            chunk = ids[start:start + 900]
+            cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(chunk))})", chunk)
+
+
+def add_daily_totals(sales):
+    days = defaultdict(lambda: [0, Decimal(0), Decimal(0), Decimal(0)])
+    for sale in sales:
+        day = days[sale['created_at'].date()]
+        day[0] += 1
+        day[1] += sale['subtotal']
+        day[2] += sale['discount']
+        day[3] += sale['total']
+    for day, (count, subtotal, discount, total) in days.items():
+        ArchivedDailyTotal.objects.get_or_create(day=day)
+        ArchivedDailyTotal.objects.filter(day=day).update(
+            sales_count=F('sales_count') + count,
+            subtotal=F('subtotal') + subtotal,
+            discount=F('discount') + discount,
+            total=F('total') + total,
+        )
+
+
+def archive_batch(horizon, batch_size=1000):
+    """Archive up to ``batch_size`` sales; returns how many were moved."""
+    with transaction.atomic():
+        sale_ids = list(
+            candidates(horizon).order_by('id').select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not sale_ids:
+            return 0
+        sales = list(Sale.objects.filter(id__in=sale_ids).values(*COPIES[0][2]))
+        invoices = [sale['invoice_number'] for sale in sales]
+        rows = {
+            ArchivedSale: sales,
+            ArchivedSaleItem: list(SaleItem.objects.filter(sale_id__in=sale_ids).values(*COPIES[1][2])),
+            ArchivedPayment: list(Payment.objects.filter(sale_id__in=sale_ids).values(*COPIES[2][2])),
+            ArchivedStockMovement: list(
+                StockMovement.objects.filter(reference__in=invoices, movement_type='out').values(*COPIES[3][2])
+            ),
+        }
+        for archive_model, _, _ in COPIES:
+            archive_model.objects.bulk_create([archive_model(**row) for row in rows[archive_model]],
+                                              batch_size=1000)
+        add_daily_totals(sales)
+
+        # Children first, the sales themselves last
+        delete_ids(DebtReminder, sale_ids, field='sale')
+        for archive_model, hot_model, _ in reversed(COPIES):
+            delete_ids(hot_model, [row['id'] for row in rows[archive_model]])
+        caching.bump('sales')
+    return len(sale_ids)
+
+
+def archived_totals():
+    """Totals of everything archived so far, from the small daily rollup table."""
+    totals = ArchivedDailyTotal.objects.aggregate(count=Sum('sales_count'), total=Sum('total'))
+    return totals['count'] or 0, totals['total'] or 0
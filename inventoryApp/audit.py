@@ -0,0 +1,106 @@
+"""Audit trail of product, sale and payment changes.
+
+Signals diff every saved row against the values it was loaded with. Each
+entry is queued as a task in the transaction of the change itself, so it
+commits or rolls back with it and survives a worker killed right after the
+commit. ``run_tasks`` bulk inserts the entries of many changes at once into
+the append-only ``audit_log`` table.
+"""
+from contextvars import ContextVar
+from datetime import datetime
+
+from django.utils import timezone
+
+from .models import AuditLog, Product, Sale, Payment
+from .tasks import enqueue, task
+
+AUDITED = {Product: 'product', Sale: 'sale', Payment: 'payment'}
+# Derived columns with no business meaning of their own
+EXCLUDED = {'image_variants'}
+
+_request = ContextVar('audit_request', default=None)
+_fields = {}
+
+
+def tracked_fields(model):
+    if model not in _fields:
+        _fields[model] = [
+            field.attname for field in model._meta.concrete_fields
+            if not field.primary_key and field.name not in EXCLUDED
+            and not getattr(field, 'auto_now', False) and not getattr(field, 'auto_now_add', False)
+        ]
+    return _fields[model]
+
+
+def snapshot(instance):
+    # Read __dict__ rather than the attributes: deferred fields must not cost a query
+    values = instance.__dict__
+    return {name: values[name] for name in tracked_fields(type(instance)) if name in values}
+
+
+def jsonable(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)  # Decimals, dates and files
+
+
+def saved(instance, created):
+    new = snapshot(instance)
+    if created:
+        changes = {name: [None, jsonable(value)] for name, value in new.items() if value not in (None, '')}
+    else:
+        old = getattr(instance, '_audit_values', {})
+        changes = {}
+        for name, value in new.items():
+            # Compare the values themselves: Decimal('7') is not a change from Decimal('7.00')
+            if name in old and old[name] != value:
+                changes[name] = [jsonable(old[name]), jsonable(value)]
+        if not changes:
+            return
+    # The next save of this instance is diffed against what was just written
+    instance._audit_values = new
+    record(instance, 'create' if created else 'update', changes)
+
+
+def deleted(instance):
+    changes = {name: [jsonable(value), None] for name, value in snapshot(instance).items() if value not in (None, '')}
+    record(instance, 'delete', changes)
+
+
+def record(instance, action, changes):
+    request = _request.get()
+    user = getattr(request, 'user', None)
+    entry = {
+        'object_type': AUDITED[type(instance)],
+        'object_id': instance.pk,
+        'object_repr': str(instance)[:200],
+        'action': action,
+        'changes': changes,
+        'user_id': user.pk if user is not None and user.is_authenticated else None,
+        'created_at': timezone.now().isoformat(),
+    }
+    # Same transaction as the change: a rolled back change leaves no entry
+    enqueue('write_audit_log', {'entries': [entry]})
+
+
+class AuditMiddleware:
+    """Remember who is making changes."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(token)
+
+
+@task(batch=True)
+def write_audit_log(payloads):
+    AuditLog.objects.bulk_create([
+        AuditLog(**{**entry, 'created_at': datetime.fromisoformat(entry['created_at'])})
+        for payload in payloads
+        for entry in payload['entries']
+    ], batch_size=1000)
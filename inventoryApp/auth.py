@@ -0,0 +1,104 @@
+"""Query-free authentication for the hot POS endpoints.
+
+``CachedModelBackend`` serves ``request.user`` from the cache, and
+``TokenAuthenticationMiddleware`` lets POS terminals authenticate JSON calls
+with ``Authorization: Token <key>`` instead of a session. Both entries are
+dropped by the receivers in signals.py when a user or token changes.
+
+That only reaches other processes through a shared cache: with locmem a
+deactivated user or deleted token keeps working in the other workers until
+the entry expires, so the system check below refuses locmem outside DEBUG.
+"""
+import hashlib
+import secrets
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core import checks
+from django.core.cache import cache
+
+from .models import ApiToken
+
+USER_TIMEOUT = 15 * 60
+TOKEN_TIMEOUT = 15 * 60
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if settings.DEBUG or not backend.endswith('.LocMemCache'):
+        return []
+    return [checks.Error(
+        'Cached users, tokens and sessions need a cache shared by every worker, not locmem.',
+        hint='Set CACHE_BACKEND to file or redis.',
+        id='inventoryApp.E001',
+    )]
+
+
+def user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def token_key(key_hash):
+    return f'auth:token:{key_hash}'
+
+
+def hash_token(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def create_token(user, name=''):
+    """Create a token and return its key; only its hash is stored."""
+    key = secrets.token_urlsafe(32)
+    ApiToken.objects.create(user=user, name=name, key_hash=hash_token(key))
+    return key
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        user = cache.get(user_key(user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(user_key(user_id), user, USER_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+
+class TokenAuthenticationMiddleware:
+    """Authenticate ``Authorization: Token <key>`` requests.
+
+    Must come after AuthenticationMiddleware. Token requests carry no cookies,
+    so CSRF checks don't apply to them.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        header = request.headers.get('Authorization', '')
+        if header.startswith('Token '):
+            user = self.authenticate(header[len('Token '):].strip())
+            if user is not None:
+                request.user = user
+                request._dont_enforce_csrf_checks = True
+        return self.get_response(request)
+
+    def authenticate(self, key):
+        key_hash = hash_token(key)
+        user_id = cache.get(token_key(key_hash))
+        if user_id is None:
+            user_id = ApiToken.objects.filter(key_hash=key_hash).values_list('user_id', flat=True).first()
+            if user_id is None:
+                return None
+            cache.set(token_key(key_hash), user_id, TOKEN_TIMEOUT)
+        return CachedModelBackend().get_user(user_id)
+
+
+def forget_user(user_id):
+    cache.delete(user_key(user_id))
+
+
+def forget_token(key_hash):
+    cache.delete(token_key(key_hash))
+
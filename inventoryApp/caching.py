@@ -0,0 +1,87 @@
+"""Versioned caching.
+
+Cached values are grouped ('products', 'sales', 'staff'). Every key embeds
+the current version of its groups, and model signals bump the version when
+a row of the group changes, so stale entries are never read again and
+simply expire. Hits and misses are counted per name in the cache itself,
+``manage.py cache_stats`` reports the ratios.
+
+Values are always computed from the primary: a replica that has not caught
+up with the change behind a bump would otherwise be cached under the new
+version until the entry expires.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from .routers import primary
+
+STATS_PREFIX = 'stats:'
+
+
+def versions(groups):
+    keys = [f'version:{group}' for group in groups]
+    found = cache.get_many(keys)
+    return [found.get(key, 1) for key in keys]
+
+
+def make_key(name, groups, *parts):
+    return ':'.join([name, *(f'{g}{v}' for g, v in zip(groups, versions(groups))), *map(str, parts)])
+
+
+def bump(*groups):
+    """Invalidate every cached value of these groups, once the transaction commits."""
+    def do_bump():
+        for group in groups:
+            key = f'version:{group}'
+            # add() is a no-op when the key exists; then incr() it
+            if not cache.add(key, 2, timeout=None):
+                try:
+                    cache.incr(key)
+                except ValueError:
+                    cache.set(key, 2, timeout=None)
+    transaction.on_commit(do_bump)
+
+
+def record(name, hit):
+    key = f"{STATS_PREFIX}{name}:{'hits' if hit else 'misses'}"
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass
+
+
+def get_or_set(name, groups, compute, timeout=300):
+    key = make_key(name, groups)
+    value = cache.get(key)
+    record(name, value is not None)
+    if value is None:
+        with primary():
+            value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+def stats(names):
+    keys = [f'{STATS_PREFIX}{name}:{kind}' for name in names for kind in ('hits', 'misses')]
+    found = cache.get_many(keys)
+    report = {}
+    for name in names:
+        hits = found.get(f'{STATS_PREFIX}{name}:hits', 0)
+        misses = found.get(f'{STATS_PREFIX}{name}:misses', 0)
+        report[name] = {'hits': hits, 'misses': misses, 'ratio': hits / (hits + misses) if hits + misses else None}
+    return report
+
+
+def reset_stats(names):
+    cache.delete_many([f'{STATS_PREFIX}{name}:{kind}' for name in names for kind in ('hits', 'misses')])
+
+
+# Everything cached through this module, for cache_stats
+CACHED_NAMES = [
+    'dashboard_counters',
+    'dashboard_recent_sales',
+    'dashboard_low_stock',
+    'product_table',
+    'staff_table',
+]
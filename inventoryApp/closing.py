@@ -0,0 +1,122 @@
+"""End-of-day close (Z-report).
+
+``report(day)`` totals a day's till activity per staff member and payment
+method with one grouped query over sales and one over payments. Closing the
+day stores the result as a ``DailyClose`` row that is never changed again,
+so an old Z-report is a single-row lookup however large the sales tables
+grow.
+
+A day can only be closed once it is over, or later sales would be in no
+Z-report, and before ``archive_sales`` may have moved its sales away, or the
+stored report would miss them.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Case, Count, Max, Sum, Value, When
+from django.utils import timezone
+
+from .models import DailyClose, Sale, Payment
+
+TOTALS = ('gross', 'discount', 'net', 'collected', 'credit_issued', 'debt_collected')
+CENT = Decimal('0.01')
+
+
+def day_range(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def report(day):
+    """Compute the Z-report of ``day`` as a dict shaped like a DailyClose."""
+    start, end = day_range(day)
+    staff = {}
+
+    def member(staff_id, username):
+        return staff.setdefault(staff_id, {
+            'staff_id': staff_id, 'username': username or '', 'sales_count': 0,
+            **{name: Decimal(0) for name in TOTALS}, 'methods': {},
+        })
+
+    sales = (
+        Sale.objects.filter(created_at__gte=start, created_at__lt=end)
+        .values('staff_id')
+        .annotate(username=Max('staff__username'), sales_count=Count('id'),
+                  gross=Sum('subtotal'), discount=Sum('discount'), net=Sum('total'))
+        .order_by()
+    )
+    for row in sales:
+        current = member(row['staff_id'], row['username'])
+        current['sales_count'] = row['sales_count']
+        for name in ('gross', 'discount', 'net'):
+            current[name] = row[name].quantize(CENT)
+        # Reduced below by what was paid on these sales the same day
+        current['credit_issued'] = current['net']
+
+    payments = (
+        Payment.objects.filter(created_at__gte=start, created_at__lt=end)
+        .annotate(on_debt=Case(When(sale__created_at__lt=start, then=Value(True)), default=Value(False),
+                               output_field=BooleanField()))
+        .values('created_by_id', 'payment_method', 'on_debt')
+        .annotate(username=Max('created_by__username'), amount=Sum('amount'))
+        .order_by()
+    )
+    for row in payments:
+        current = member(row['created_by_id'], row['username'])
+        method = row['payment_method']
+        amount = row['amount'].quantize(CENT)
+        current['collected'] += amount
+        current['methods'][method] = current['methods'].get(method, Decimal(0)) + amount
+        if row['on_debt']:
+            current['debt_collected'] += amount
+        else:
+            current['credit_issued'] -= amount
+
+    result = {'day': day, 'sales_count': 0, **{name: Decimal(0) for name in TOTALS}, 'by_method': {}}
+    for current in staff.values():
+        result['sales_count'] += current['sales_count']
+        for name in TOTALS:
+            result[name] += current[name]
+        for method, amount in current['methods'].items():
+            result['by_method'][method] = result['by_method'].get(method, Decimal(0)) + amount
+    result['by_staff'] = sorted(staff.values(), key=lambda current: current['username'])
+    return result
+
+
+def jsonable(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: jsonable(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [jsonable(item) for item in value]
+    return value
+
+
+def can_close(day):
+    """Why ``day`` can't be closed, or None."""
+    if day >= timezone.localdate():
+        return f'{day} is not over yet'
+    if day_range(day)[0] < timezone.now() - timedelta(days=settings.SALES_ARCHIVE_DAYS):
+        return f'{day} is older than {settings.SALES_ARCHIVE_DAYS} days, its sales may already be archived'
+    return None
+
+
+def close_day(day, user=None):
+    """Freeze the Z-report of ``day``; raises ValueError if it can't be closed."""
+    reason = can_close(day)
+    if reason:
+        raise ValueError(reason)
+    result = report(day)
+    try:
+        with transaction.atomic():
+            return DailyClose.objects.create(
+                **{key: value for key, value in result.items() if key not in ('by_method', 'by_staff')},
+                by_method=jsonable(result['by_method']),
+                by_staff=jsonable(result['by_staff']),
+                closed_by=user,
+            )
+    except IntegrityError:
+        raise ValueError(f'{day} is already closed')
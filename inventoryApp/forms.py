@@ -1,6 +1,6 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
-from .models import (User, Product, Category, Supplier, Payment)
+from .models import (User, Product, Category, Supplier, Payment, Promotion)
 
 class StaffRegistrationForm(UserCreationForm):
     email = forms.EmailField(required=True)
@@ -66,3 +66,34 @@ class PaymentForm(forms.ModelForm):
     class Meta:
         model = Payment
         fields = ['amount', 'payment_method', 'reference', 'notes']
+
+class PromotionForm(forms.ModelForm):
+    class Meta:
+        model = Promotion
+        fields = ['name', 'kind', 'product', 'category', 'value', 'buy_quantity', 'free_quantity',
+                  'starts_at', 'ends_at']
+        widgets = {
+            # An id filled in by the product search on the page: a select would list the whole catalog
+            'product': forms.NumberInput(attrs={'placeholder': 'Product ID'}),
+            'starts_at': forms.DateTimeInput(attrs={'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M'),
+            'ends_at': forms.DateTimeInput(attrs={'type': 'datetime-local'}, format='%Y-%m-%dT%H:%M'),
+        }
+    def clean(self):
+        cleaned_data = super().clean()
+        kind = cleaned_data.get('kind')
+        product = cleaned_data.get('product')
+        category = cleaned_data.get('category')
+        
+        if bool(product) == bool(category):
+            raise forms.ValidationError('Choose either a product or a category.')
+        if kind == 'price' and not product:
+            raise forms.ValidationError('A price change applies to a single product.')
+        if kind == 'percent' and (cleaned_data.get('value') or 0) > 100:
+            self.add_error('value', 'A percentage cannot exceed 100.')
+        if kind == 'bxgy' and not (cleaned_data.get('buy_quantity') and cleaned_data.get('free_quantity')):
+            raise forms.ValidationError('Buy X get Y needs both quantities.')
+        
+        starts_at, ends_at = cleaned_data.get('starts_at'), cleaned_data.get('ends_at')
+        if starts_at and ends_at and ends_at <= starts_at:
+            self.add_error('ends_at', 'The promotion must end after it starts.')
+        return cleaned_data
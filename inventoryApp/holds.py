@@ -0,0 +1,75 @@
+"""Soft holds on stock for open POS carts.
+
+Adding an item to a cart holds its quantity for ``CART_HOLD_SECONDS``;
+every change to the cart extends the whole cart. Checkout turns the holds
+into the sale, and expired holds simply stop counting, so a crashed till
+never locks stock for long. ``manage.py release_expired_holds`` deletes
+them for good.
+
+What other tills can still sell is ``quantity - held``, where ``held`` is
+one grouped SUM over the products at hand, answered from the
+(product, expires_at, quantity) index.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import StockHold
+
+
+def expiry():
+    return timezone.now() + timedelta(seconds=getattr(settings, 'CART_HOLD_SECONDS', 300))
+
+
+def held(product_ids, exclude_cart=None):
+    """Quantity held by open carts, ``{product_id: quantity}``, products without holds left out."""
+    holds = StockHold.objects.filter(product_id__in=product_ids, expires_at__gt=timezone.now())
+    if exclude_cart:
+        holds = holds.exclude(cart=exclude_cart)
+    return dict(holds.values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total').order_by())
+
+
+def available(quantities, exclude_cart=None):
+    """Turn ``{product_id: quantity in stock}`` into what is left for sale (None stays None)."""
+    holding = held([pid for pid, quantity in quantities.items() if quantity is not None], exclude_cart)
+    return {
+        pid: quantity if quantity is None else max(quantity - holding.get(pid, 0), 0)
+        for pid, quantity in quantities.items()
+    }
+
+
+def hold(cart, product, quantity, user):
+    """Hold ``quantity`` of a locked ``product`` for ``cart`` (0 releases it).
+
+    Returns what other carts leave available; raises ValueError when the
+    request does not fit.
+    """
+    left = available({product.id: product.quantity}, exclude_cart=cart)[product.id]
+    if quantity > left:
+        raise ValueError(f'{product.name} has insufficient stock. Available: {left}, Requested: {quantity}')
+    if quantity:
+        StockHold.objects.update_or_create(
+            cart=cart, product=product,
+            defaults={'quantity': quantity, 'user': user, 'expires_at': expiry()},
+        )
+    else:
+        StockHold.objects.filter(cart=cart, product=product).delete()
+    # Any activity keeps the whole cart alive
+    StockHold.objects.filter(cart=cart).update(expires_at=expiry())
+    return left
+
+
+def release(cart):
+    return StockHold.objects.filter(cart=cart).delete()[0]
+
+
+def sweep(batch_size=1000):
+    """Delete expired holds in batches; returns how many were deleted."""
+    deleted = 0
+    while True:
+        ids = list(StockHold.objects.filter(expires_at__lte=timezone.now()).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += StockHold.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,93 @@
+"""Product image variants.
+
+Uploads are resized once, in the background, into small JPEG and WebP
+variants stored under content-hashed names. A hashed file never changes, so
+it can be cached by browsers for a year.
+"""
+import hashlib
+import io
+import re
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+from PIL import Image, ImageOps
+
+from . import caching
+from .models import Product
+from .tasks import task
+
+# name -> (size, crop to square)
+SIZES = {
+    'thumb': ((96, 96), True),
+    'medium': ((400, 400), False),
+}
+FORMATS = {
+    'jpg': ('JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 75, 'method': 4}),
+}
+VARIANT_DIR = 'products/variants/'
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{16}\.\w+$')
+
+
+def hashed_name(directory, data, ext):
+    return f"{directory}{hashlib.sha256(data).hexdigest()[:16]}.{ext}"
+
+
+def build_variants(image_name):
+    """Write every size/format variant of an image and return their storage names.
+
+    Touches only the storage, never the database, so it is safe to run in a
+    thread pool.
+    """
+    with default_storage.open(image_name) as f:
+        source = ImageOps.exif_transpose(Image.open(f))
+        source = source.convert('RGB')
+
+    variants = {}
+    for size_name, (size, crop) in SIZES.items():
+        if crop:
+            resized = ImageOps.fit(source, size, Image.LANCZOS)
+        else:
+            resized = source.copy()
+            resized.thumbnail(size, Image.LANCZOS)
+        for ext, (fmt, params) in FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, fmt, **params)
+            data = buffer.getvalue()
+            name = hashed_name(VARIANT_DIR, data, ext)
+            # Same content, same name: nothing to write twice
+            if not default_storage.exists(name):
+                default_storage.save(name, ContentFile(data))
+            variants[size_name if ext == 'jpg' else f"{size_name}_{ext}"] = name
+    return variants
+
+
+def variant_url(variants, name='thumb'):
+    path = (variants or {}).get(name)
+    return default_storage.url(path) if path else None
+
+
+@task(batch=True)
+def generate_image_variants(payloads):
+    product_ids = {pid for payload in payloads for pid in payload['product_ids']}
+    for product_id, image in Product.objects.filter(id__in=product_ids).exclude(image='').values_list('id', 'image'):
+        if image:
+            save_variants(product_id, image, build_variants(image))
+
+
+def save_variants(product_id, image, variants):
+    # Bump updated_at so API ETags and the sync feed pick up the new URLs.
+    # Filtering on the image skips products whose image changed meanwhile.
+    Product.objects.filter(id=product_id, image=image).update(image_variants=variants, updated_at=timezone.now())
+    caching.bump('products')
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """Development media server that marks content-hashed files as immutable."""
+    response = serve(request, path, document_root, show_indexes)
+    if response.status_code == 200 and HASHED_NAME.search(path):
+        patch_cache_control(response, public=True, max_age=365 * 24 * 60 * 60, immutable=True)
+    return response
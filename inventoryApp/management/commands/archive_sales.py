@@ -0,0 +1,34 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventoryApp import archive
+
+
+class Command(BaseCommand):
+    help = 'Move old, fully paid sales with their items, payments and stock movements to the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.SALES_ARCHIVE_DAYS,
+                            help='Archive sales older than this many days')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Sales moved per transaction')
+        parser.add_argument('--max-batches', type=int, default=0, help='Stop after this many batches (0 = no limit)')
+        parser.add_argument('--sleep', type=float, default=0, help='Pause between batches to limit load')
+
+    def handle(self, *args, **options):
+        horizon = timezone.now() - timedelta(days=options['days'])
+        moved = batches = 0
+        while not options['max_batches'] or batches < options['max_batches']:
+            count = archive.archive_batch(horizon, options['batch_size'])
+            if not count:
+                break
+            moved += count
+            batches += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  batch {batches}: {count} sales")
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} sales in {batches} batch(es)"))
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from inventoryApp.images import build_variants, save_variants
+from inventoryApp.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnail and WebP variants for existing product images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Threads resizing images in parallel')
+        parser.add_argument('--chunk-size', type=int, default=200)
+        parser.add_argument('--force', action='store_true', help='Rebuild variants that already exist')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['force']:
+            products = products.filter(image_variants={})
+
+        done = failed = 0
+        last_id = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                chunk = list(
+                    products.filter(id__gt=last_id).order_by('id')
+                    .values_list('id', 'image')[:options['chunk_size']]
+                )
+                if not chunk:
+                    break
+                last_id = chunk[-1][0]
+                # Threads only resize and write files; database updates stay on this thread
+                futures = [(pid, image, pool.submit(build_variants, image)) for pid, image in chunk]
+                for pid, image, future in futures:
+                    try:
+                        save_variants(pid, image, future.result())
+                        done += 1
+                    except Exception as e:
+                        failed += 1
+                        self.stderr.write(f"Product {pid} ({image}): {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Generated variants for {done} product(s), {failed} failed"))
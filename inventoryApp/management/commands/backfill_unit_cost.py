@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
+
+from inventoryApp.models import Product, SaleItem, ArchivedSaleItem
+
+
+class Command(BaseCommand):
+    help = 'Fill in the unit cost of sale lines recorded before costs were snapshotted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Sale lines per UPDATE (one transaction each)')
+
+    def handle(self, *args, **options):
+        # Stock movements carry no cost, so the product's current cost price is
+        # the best estimate we have for old lines.
+        cost = Subquery(Product.objects.filter(id=OuterRef('product_id')).values('cost_price')[:1])
+        for model in (SaleItem, ArchivedSaleItem):
+            updated = 0
+            last_id = 0
+            max_id = model.objects.aggregate(Max('id'))['id__max'] or 0
+            # Walk primary key ranges so every UPDATE touches a bounded slice
+            while last_id < max_id:
+                upper = last_id + options['chunk_size']
+                with transaction.atomic():
+                    updated += model.objects.filter(
+                        id__gt=last_id, id__lte=upper, unit_cost__isnull=True, product__isnull=False,
+                    ).update(unit_cost=cost)
+                last_id = upper
+            missing = model.objects.filter(unit_cost__isnull=True).count()
+            self.stdout.write(self.style.SUCCESS(
+                f"{model._meta.db_table}: {updated} line(s) backfilled, {missing} without a product left at no cost"
+            ))
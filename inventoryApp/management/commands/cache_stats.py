@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from inventoryApp import caching
+
+
+class Command(BaseCommand):
+    help = 'Show cache hit ratios of the dashboard, product and staff caches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them')
+
+    def handle(self, *args, **options):
+        for name, row in caching.stats(caching.CACHED_NAMES).items():
+            ratio = f"{row['ratio']:.1%}" if row['ratio'] is not None else '-'
+            self.stdout.write(f"{name:<25} hits {row['hits']:>8}  misses {row['misses']:>8}  ratio {ratio}")
+        if options['reset']:
+            caching.reset_stats(caching.CACHED_NAMES)
@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventoryApp import closing
+
+
+class Command(BaseCommand):
+    help = "Close a finished business day and store its Z-report (run after midnight, e.g. from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='Day to close, YYYY-MM-DD (default: yesterday)')
+        parser.add_argument('--yesterday', action='store_true', help='Close yesterday (the default)')
+        parser.add_argument('--dry-run', action='store_true', help='Print the report without closing the day')
+
+    def handle(self, *args, **options):
+        day = options['date'] or timezone.localdate() - timedelta(days=1)
+        if options['yesterday']:
+            day = timezone.localdate() - timedelta(days=1)
+
+        if options['dry_run']:
+            result = closing.report(day)
+        else:
+            try:
+                result = closing.close_day(day)
+            except ValueError as e:
+                raise CommandError(str(e))
+            result = {field: getattr(result, field) for field in ('day', 'sales_count', *closing.TOTALS, 'by_method', 'by_staff')}
+
+        self.stdout.write(f"Z-report {result['day']}: {result['sales_count']} sale(s)")
+        for name in closing.TOTALS:
+            self.stdout.write(f"  {name.replace('_', ' '):<15} {result[name]:>14,.2f}")
+        for method, amount in result['by_method'].items():
+            self.stdout.write(f"  {method:<15} {amount:>14}")
+        for member in result['by_staff']:
+            self.stdout.write(f"  {member['username'] or '-':<15} sales {member['sales_count']:>5}  net {member['net']:>12}  "
+                              f"collected {member['collected']:>12}")
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"{day} closed"))
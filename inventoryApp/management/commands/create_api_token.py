@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventoryApp.auth import create_token
+from inventoryApp.models import User
+
+
+class Command(BaseCommand):
+    help = 'Create an API token for a POS terminal (the key is only shown once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--name', default='', help='Label for the token, e.g. "Till 3"')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist")
+        self.stdout.write(create_token(user, options['name']))
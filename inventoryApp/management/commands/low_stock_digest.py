@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from inventoryApp import alerts
+
+
+class Command(BaseCommand):
+    help = 'Email one digest per supplier for new low-stock alerts (run periodically, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Print the digests without sending or marking them')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            for (_, supplier_name), rows in alerts.pending_digest().items():
+                self.stdout.write(alerts.format_digest(supplier_name, rows) + '\n')
+            return
+        count = alerts.send_digest()
+        self.stdout.write(f"Sent digest for {count} low-stock alert(s)")
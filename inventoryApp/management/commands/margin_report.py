@@ -0,0 +1,43 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventoryApp import analytics
+
+
+class Command(BaseCommand):
+    help = 'Gross margin by product, category, staff or day'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--by', choices=list(analytics.DIMENSIONS), default='product')
+        parser.add_argument('--days', type=int, default=30, help='Period ending today (ignored with --start)')
+        parser.add_argument('--start', type=date.fromisoformat, help='First day, YYYY-MM-DD')
+        parser.add_argument('--end', type=date.fromisoformat, help='Day after the last one, YYYY-MM-DD')
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--order', choices=['margin', 'revenue', 'margin_pct', 'quantity'], default='margin')
+        parser.add_argument('--compare', action='store_true', help='Show changes against the previous period')
+        parser.add_argument('--abc', action='store_true', help='ABC classification by revenue')
+
+    def handle(self, *args, **options):
+        start, end = analytics.default_period(options['days'])
+        if options['start']:
+            start, end = options['start'], options['end'] or end
+        if start >= end:
+            raise CommandError('--start must be before --end')
+
+        result = analytics.report(options['by'], start, end, top=options['top'], order_by=options['order'],
+                                  with_comparison=options['compare'], with_abc=options['abc'])
+        self.stdout.write(f"Margin by {options['by']}, {start} to {end} ({result['groups']} groups)")
+        for row in result['rows']:
+            line = (f"{str(row['label'] or row['key'])[:30]:<30} revenue {row['revenue']:>14,.2f}  "
+                    f"margin {row['margin']:>14,.2f}  {row['margin_pct'] if row['margin_pct'] is not None else '-':>7}%")
+            if options['abc']:
+                line += f"  {row['abc']}"
+            if options['compare']:
+                change = row['margin_change_pct']
+                line += f"  margin {'+' if row['margin_delta'] >= 0 else ''}{row['margin_delta']:,.2f}"
+                line += f" ({change}%)" if change is not None else ' (new)'
+            self.stdout.write(line)
+        totals = result['totals']
+        self.stdout.write(f"Total revenue {totals['revenue']:,.2f}, cost {totals['cost']:,.2f}, "
+                          f"margin {totals['margin']:,.2f}")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from inventoryApp import prices
+
+
+class Command(BaseCommand):
+    help = 'Apply due price changes and rebuild expired or missing effective prices (run every minute, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild the effective prices of the whole catalog')
+
+    def handle(self, *args, **options):
+        applied = prices.apply_price_changes()
+        count = prices.refresh() if options['all'] else prices.refresh_expired()
+        self.stdout.write(f"Applied {applied} price change(s), refreshed {count} effective price(s)")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventoryApp import holds
+
+
+class Command(BaseCommand):
+    help = 'Delete expired cart holds (run periodically, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = holds.sweep(options['batch_size'])
+        self.stdout.write(f"Released {count} expired hold(s)")
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventoryApp import tasks
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Tasks claimed per round')
+        parser.add_argument('--visibility-timeout', type=int, default=300,
+                            help='Seconds before a claimed but unfinished task can be claimed again')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            claimed = tasks.claim(options['batch_size'], options['visibility_timeout'])
+            if not claimed:
+                if options['burst']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            done, failed = tasks.run(claimed)
+            if options['verbosity'] > 1 or failed:
+                self.stdout.write(f"Ran {done + failed} tasks: {done} done, {failed} failed")
@@ -0,0 +1,292 @@
+import multiprocessing
+import random
+import time
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Max, signals
+
+from inventoryApp.models import (User, Category, Supplier, Product, Sale, SaleItem, StockMovement, Payment)
+
+SIGNALS = (signals.pre_save, signals.post_save, signals.pre_delete, signals.post_delete, signals.m2m_changed)
+PAYMENT_METHODS = ('cash', 'cash', 'cash', 'card', 'transfer')
+
+# Column order of the tuples produced by SaleGenerator.
+SALE_FIELDS = ('id', 'invoice_number', 'staff', 'customer_name', 'customer_phone', 'subtotal', 'discount',
+               'total', 'amount_paid', 'balance', 'payment_status', 'created_at')
+ITEM_FIELDS = ('sale', 'product', 'product_name', 'quantity', 'price', 'discount', 'total', 'unit_cost')
+PAYMENT_FIELDS = ('sale', 'amount', 'payment_method', 'reference', 'notes', 'created_by', 'created_at')
+MOVEMENT_FIELDS = ('product', 'movement_type', 'quantity', 'reference', 'notes', 'created_by', 'created_at')
+PRODUCT_FIELDS = ('id', 'name', 'sku', 'category', 'supplier', 'description', 'price', 'cost_price',
+                  'quantity', 'reorder_level', 'image', 'created_at', 'updated_at')
+
+
+def cents(value):
+    # Integer kobo -> decimal string; the drivers take it as-is for DecimalFields.
+    return f"{value // 100}.{value % 100:02d}"
+
+
+@contextmanager
+def signals_disabled():
+    # Raw inserts never fire model signals, but the catalog and staff rows we
+    # create through the ORM must not trigger receivers (cache bumps, audit...).
+    saved = [(signal, signal.receivers) for signal in SIGNALS]
+    try:
+        for signal, _ in saved:
+            signal.receivers = []
+            signal.sender_receivers_cache.clear()
+        yield
+    finally:
+        for signal, receivers in saved:
+            signal.receivers = receivers
+            signal.sender_receivers_cache.clear()
+
+
+def insert_rows(model, fields, rows):
+    """INSERT plain tuples with executemany(), skipping model instantiation.
+
+    Columns not listed in ``fields`` get their model default (or "now" for
+    auto_now fields), so new NOT NULL columns don't break the generator.
+    """
+    if not rows:
+        return 0
+    connection = connections['default']
+    qn = connection.ops.quote_name
+    columns = [model._meta.get_field(name) for name in fields]
+    extra, extra_values = [], []
+    now = datetime.now(dt_timezone.utc)
+    for field in model._meta.concrete_fields:
+        if field in columns or field.primary_key:
+            continue
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            value = now
+        elif field.has_default():
+            value = field.get_default()
+        else:
+            continue
+        extra.append(field)
+        extra_values.append(field.get_db_prep_save(value, connection))
+    if extra:
+        extra_values = tuple(extra_values)
+        rows = [row + extra_values for row in rows]
+
+    names = ', '.join(qn(field.column) for field in columns + extra)
+    placeholders = ', '.join(['%s'] * (len(columns) + len(extra)))
+    with connection.cursor() as cursor:
+        cursor.executemany(f"INSERT INTO {qn(model._meta.db_table)} ({names}) VALUES ({placeholders})", rows)
+    return len(rows)
+
+
+class SaleGenerator:
+    """Builds one chunk of sales (plus items, payments and movements).
+
+    Every chunk has its own RNG derived from the seed and the chunk number, so
+    the generated data is identical whatever the number of workers.
+    """
+
+    def __init__(self, options, products, staff_ids, first_sale_id, start, span):
+        self.options = options
+        self.product_ids = [p[0] for p in products]
+        self.product_names = [p[1] for p in products]
+        self.product_prices = [p[2] for p in products]
+        self.product_costs = [p[3] for p in products]
+        # Zipf-like popularity: rank r is picked with weight 1 / r**skew
+        skew = options['skew']
+        self.cum_weights = list(accumulate(1 / (rank ** skew) for rank in range(1, len(products) + 1)))
+        self.staff_ids = staff_ids
+        self.first_sale_id = first_sale_id
+        self.start = start
+        self.span = span
+
+    def pick_product(self, rng):
+        return bisect(self.cum_weights, rng.random() * self.cum_weights[-1])
+
+    def build(self, chunk):
+        opts = self.options
+        rng = random.Random(f"{opts['seed']}:{chunk}")
+        first = chunk * opts['chunk_size']
+        last = min(first + opts['chunk_size'], opts['sales'])
+        max_items = max(1, opts['items_per_sale'] * 2 - 1)
+        adapt_datetime = connections['default'].ops.adapt_datetimefield_value
+
+        sales, items, payments, movements = [], [], [], []
+        for n in range(first, last):
+            sale_id = self.first_sale_id + n
+            invoice = f"INV-{sale_id:06d}"
+            created_at = adapt_datetime(
+                self.start + self.span * (n / max(opts['sales'], 1)) + timedelta(seconds=rng.randint(0, 59))
+            )
+            staff_id = rng.choice(self.staff_ids)
+
+            subtotal = discount_total = 0
+            for _ in range(rng.randint(1, max_items)):
+                idx = self.pick_product(rng)
+                product_id = self.product_ids[idx]
+                price = self.product_prices[idx]
+                quantity = 1 if rng.random() < 0.6 else rng.randint(2, 5)
+                line = price * quantity
+                discount = line * rng.randint(1, 10) // 100 if rng.random() < 0.1 else 0
+                subtotal += line
+                discount_total += discount
+                items.append((sale_id, product_id, self.product_names[idx], quantity,
+                              cents(price), cents(discount), cents(line - discount),
+                              cents(self.product_costs[idx])))
+                if opts['movements']:
+                    movements.append((product_id, 'out', -quantity, invoice, '', staff_id, created_at))
+
+            total = subtotal - discount_total
+            roll = rng.random()
+            if roll < opts['unpaid_ratio']:
+                amount_paid, status = 0, 'unpaid'
+            elif roll < opts['unpaid_ratio'] + opts['partial_ratio']:
+                amount_paid, status = total * rng.randint(10, 90) // 100, 'partial'
+            else:
+                amount_paid, status = total, 'paid'
+
+            sales.append((sale_id, invoice, staff_id, f"Customer {rng.randint(1, 50000)}",
+                          f"080{rng.randint(0, 99999999):08d}", cents(subtotal), cents(discount_total),
+                          cents(total), cents(amount_paid), cents(total - amount_paid), status, created_at))
+            if amount_paid:
+                payments.append((sale_id, cents(amount_paid), rng.choice(PAYMENT_METHODS), '', '',
+                                 staff_id, created_at))
+        return sales, items, payments, movements
+
+    def write(self, chunk):
+        return self.insert(self.build(chunk))
+
+    def insert(self, rows):
+        sales, items, payments, movements = rows
+        with transaction.atomic():
+            return (
+                insert_rows(Sale, SALE_FIELDS, sales)
+                + insert_rows(SaleItem, ITEM_FIELDS, items)
+                + insert_rows(Payment, PAYMENT_FIELDS, payments)
+                + insert_rows(StockMovement, MOVEMENT_FIELDS, movements)
+            )
+
+
+# Worker processes are forked, so they inherit the generator built by the parent.
+_generator = None
+
+
+def _write_chunk(chunk):
+    return _generator.write(chunk)
+
+
+def _build_chunk(chunk):
+    return _generator.build(chunk)
+
+
+class Command(BaseCommand):
+    help = 'Generate a large, deterministic synthetic dataset for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--sales', type=int, default=1_000_000)
+        parser.add_argument('--items-per-sale', type=int, default=5, help='Average number of lines per sale')
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--suppliers', type=int, default=200)
+        parser.add_argument('--staff', type=int, default=20)
+        parser.add_argument('--days', type=int, default=365, help='Spread sales over this many days up to today')
+        parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of product popularity')
+        parser.add_argument('--unpaid-ratio', type=float, default=0.05)
+        parser.add_argument('--partial-ratio', type=float, default=0.10)
+        parser.add_argument('--movements', action='store_true', help='Also write a stock movement per sale line')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Sales per insert batch (one transaction each)')
+        parser.add_argument('--workers', type=int, default=0,
+                            help='Worker processes (0 = run in this process); on SQLite they only generate rows')
+
+    def handle(self, *args, **options):
+        if options['products'] < 1 or options['staff'] < 1:
+            raise CommandError('At least one product and one staff member are required')
+        if options['unpaid_ratio'] + options['partial_ratio'] > 1:
+            raise CommandError('--unpaid-ratio and --partial-ratio cannot add up to more than 1')
+
+        started = time.perf_counter()
+        rng = random.Random(options['seed'])
+        with signals_disabled():
+            staff_ids = self.seed_staff(options)
+            products = self.seed_catalog(options, rng)
+        self.stdout.write(f"Catalog ready: {len(products)} products, {len(staff_ids)} staff")
+
+        global _generator
+        end = datetime.combine(datetime.now(dt_timezone.utc).date(), dt_time.min, tzinfo=dt_timezone.utc)
+        span = timedelta(days=options['days'])
+        first_sale_id = (Sale.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        _generator = SaleGenerator(options, products, staff_ids, first_sale_id, end - span, span)
+
+        chunks = range((options['sales'] + options['chunk_size'] - 1) // options['chunk_size'])
+        rows = 0
+        if options['workers'] > 0:
+            try:
+                context = multiprocessing.get_context('fork')
+            except ValueError:
+                raise CommandError('--workers needs a platform that supports fork()')
+            # Children must open their own database connections.
+            connections.close_all()
+            with context.Pool(options['workers']) as pool:
+                if connections['default'].vendor == 'sqlite':
+                    # SQLite takes one writer at a time: workers only generate, this process inserts
+                    for built in pool.imap_unordered(_build_chunk, chunks):
+                        rows += _generator.insert(built)
+                else:
+                    for written in pool.imap_unordered(_write_chunk, chunks):
+                        rows += written
+        else:
+            for chunk in chunks:
+                rows += _write_chunk(chunk)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"  chunk {chunk + 1}/{len(chunks)}")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {options['sales']} sales ({rows} rows) in {elapsed:.1f}s, {rows / elapsed:,.0f} rows/sec"
+        ))
+
+    def seed_staff(self, options):
+        password = make_password('password123')
+        usernames = [f"seed_staff_{i}" for i in range(options['staff'])]
+        User.objects.bulk_create(
+            [User(username=name, first_name='Seed', last_name=str(i), role='staff', password=password)
+             for i, name in enumerate(usernames)],
+            ignore_conflicts=True,
+        )
+        return list(User.objects.filter(username__in=usernames).order_by('id').values_list('id', flat=True))
+
+    def seed_catalog(self, options, rng):
+        Category.objects.bulk_create(
+            [Category(name=f"Seed Category {i}") for i in range(options['categories'])],
+            ignore_conflicts=True,
+        )
+        category_ids = list(Category.objects.filter(name__startswith='Seed Category ').order_by('id').values_list('id', flat=True))
+        existing = Supplier.objects.filter(name__startswith='Seed Supplier ').count()
+        Supplier.objects.bulk_create([
+            Supplier(name=f"Seed Supplier {i}", phone=f"070{i:08d}")
+            for i in range(existing, options['suppliers'])
+        ])
+        supplier_ids = list(Supplier.objects.filter(name__startswith='Seed Supplier ').order_by('id').values_list('id', flat=True))
+
+        first_id = (Product.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        now = connections['default'].ops.adapt_datetimefield_value(datetime.now(dt_timezone.utc))
+        # Prices are kept as integer kobo while generating.
+        products, rows = [], []
+        for pid in range(first_id, first_id + options['products']):
+            cost = rng.randint(50, 500_000)
+            price = cost + cost * rng.randint(5, 60) // 100
+            name = f"Seed Product {pid}"
+            products.append((pid, name, price, cost))
+            rows.append((pid, name, f"SEED-{pid:08d}", rng.choice(category_ids) if category_ids else None,
+                         rng.choice(supplier_ids) if supplier_ids else None, '', cents(price), cents(cost),
+                         rng.randint(0, 500), rng.choice((5, 10, 10, 20)), '', now, now))
+
+        batch = options['chunk_size']
+        for offset in range(0, len(rows), batch):
+            with transaction.atomic():
+                insert_rows(Product, PRODUCT_FIELDS, rows[offset:offset + batch])
+        return products
@@ -0,0 +1,38 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventoryApp import reminders
+
+
+class Command(BaseCommand):
+    help = 'Send payment reminders to customers with overdue balances (run periodically, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-days', type=int, default=7, help='Only sales at least this many days old')
+        parser.add_argument('--min-balance', type=Decimal, default=Decimal(0), help='Only balances above this amount')
+        parser.add_argument('--interval', type=int, default=7, help='Days before the same sale is reminded again')
+        parser.add_argument('--limit', type=int, help='Send at most this many reminders')
+        parser.add_argument('--workers', type=int, default=8, help='Threads sending in parallel')
+        parser.add_argument('--rate', type=float, help='Messages per second (default: REMINDER_RATE_LIMIT)')
+        parser.add_argument('--retries', type=int, default=2, help='Retries of a failed send')
+        parser.add_argument('--dry-run', action='store_true', help='Print the messages without sending or recording them')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        sales = reminders.due_debtors(options['min_days'], options['min_balance'], options['interval'], options['limit'])
+        if options['dry_run']:
+            now = timezone.now()
+            count = 0
+            for sale in sales:
+                self.stdout.write(f"To {sale['customer_phone']}: {reminders.render(sale, now)}")
+                count += 1
+            self.stdout.write(f"{count} reminder(s) would be sent")
+            return
+
+        sent, failed = reminders.send_reminders(sales, workers=options['workers'], rate=options['rate'],
+                                                retries=options['retries'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} reminder(s), {failed} failed, in {elapsed:.1f}s"))
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventoryApp', '0003_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowStockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('is_open', models.BooleanField(default=True)),
+                ('triggered_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='low_stock_alert', to='inventoryApp.product')),
+            ],
+            options={
+                'db_table': 'low_stock_alerts',
+                'indexes': [models.Index(fields=['is_open', 'notified_at'], name='alerts_open_notified_idx')],
+            },
+        ),
+    ]
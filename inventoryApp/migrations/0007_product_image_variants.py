@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:02
+
+from django.db import migrations, models
+import inventoryApp.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventoryApp', '0006_product_change_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(blank=True, null=True, upload_to=inventoryApp.models.product_image_path),
+        ),
+    ]
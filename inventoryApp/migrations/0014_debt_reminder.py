@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventoryApp', '0013_daily_close'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DebtReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone', models.CharField(max_length=20)),
+                ('message', models.TextField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('sale', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='inventoryApp.sale')),
+            ],
+            options={
+                'db_table': 'debt_reminders',
+                'indexes': [models.Index(fields=['sale', 'created_at'], name='reminders_sale_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:36
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventoryApp', '0014_debt_reminder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Promotion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('kind', models.CharField(choices=[('price', 'Price change'), ('percent', 'Percentage off'), ('bxgy', 'Buy X get Y free')], max_length=20)),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('buy_quantity', models.PositiveIntegerField(default=0)),
+                ('free_quantity', models.PositiveIntegerField(default=0)),
+                ('starts_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ends_at', models.DateTimeField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('applied_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promotions', to='inventoryApp.category')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='promotions', to='inventoryApp.product')),
+            ],
+            options={
+                'db_table': 'promotions',
+                'ordering': ['-starts_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EffectivePrice',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='effective_price', serialize=False, to='inventoryApp.product')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('regular_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('buy_quantity', models.PositiveIntegerField(default=0)),
+                ('free_quantity', models.PositiveIntegerField(default=0)),
+                ('valid_until', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('deal', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventoryApp.promotion')),
+                ('promotion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventoryApp.promotion')),
+            ],
+            options={
+                'db_table': 'effective_prices',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='promotion',
+            index=models.Index(fields=['is_active', 'starts_at'], name='promotions_active_start_idx'),
+        ),
+    ]
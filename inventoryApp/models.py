@@ -3,6 +3,8 @@ from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from django.utils import timezone
+import hashlib
+import os
 import uuid
 
 class User(AbstractUser):
@@ -22,6 +24,7 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'categories'
@@ -37,6 +40,7 @@ class Supplier(models.Model):
     phone = models.CharField(max_length=15)
     address = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'suppliers'
@@ -44,6 +48,13 @@ class Supplier(models.Model):
     def __str__(self):
         return self.name
 
+def product_image_path(instance, filename):
+    # Content-hashed name: a changed image always gets a new URL, so it can be cached forever
+    digest = hashlib.sha256()
+    for chunk in instance.image.chunks():
+        digest.update(chunk)
+    return f"products/{digest.hexdigest()[:16]}{os.path.splitext(filename)[1].lower()}"
+
 class Product(models.Model):
     name = models.CharField(max_length=200)
     sku = models.CharField(max_length=50, unique=True, editable=False, blank=True)
@@ -54,13 +65,18 @@ class Product(models.Model):
     cost_price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)], default=0)
     quantity = models.IntegerField(default=0, validators=[MinValueValidator(0)])
     reorder_level = models.IntegerField(default=10, validators=[MinValueValidator(0)]) #  It's the minimum quantity threshold that triggers a reorder alert
-    image = models.ImageField(upload_to='products/', blank=True, null=True)
+    image = models.ImageField(upload_to=product_image_path, blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # Resized copies, see images.py
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'products'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset order of the catalog change feed
+            models.Index(fields=['updated_at', 'id'], name='products_updated_at_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.sku})"
@@ -77,6 +93,22 @@ class Product(models.Model):
     @property
     def is_low_stock(self):
         return self.quantity <= self.reorder_level
+    
+    @property
+    def thumbnail_url(self):
+        if not self.image:
+            return None
+        thumb = self.image_variants.get('thumb')
+        return self.image.storage.url(thumb) if thumb else self.image.url
+
+class ProductTombstone(models.Model):
+    # Left behind by deleted products so sync clients can drop them
+    product_id = models.BigIntegerField()
+    sku = models.CharField(max_length=50)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'product_tombstones'
 
 class Sale(models.Model):
     invoice_number = models.CharField(max_length=50, unique=True)
@@ -94,10 +126,15 @@ class Sale(models.Model):
         ('unpaid', 'Unpaid')
     ], default='paid')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'sales'
         ordering = ['-created_at']
+        indexes = [
+            # Archive candidates: paid sales older than the horizon
+            models.Index(fields=['payment_status', 'created_at'], name='sales_status_created_idx'),
+        ]
     
     def __str__(self):
         return f"Invoice {self.invoice_number}"
@@ -114,6 +151,8 @@ class SaleItem(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total = models.DecimalField(max_digits=10, decimal_places=2)
+    # Cost price at the time of sale; null only on lines not backfilled yet
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     
     class Meta:
         db_table = 'sale_items'
@@ -138,6 +177,9 @@ class Payment(models.Model):
     class Meta:
         db_table = 'payments'
         ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Payment of {self.amount} on sale #{self.sale_id}"
 
 class StockMovement(models.Model):
     MOVEMENT_TYPES = [
@@ -148,11 +190,306 @@ class StockMovement(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPES)
     quantity = models.IntegerField()
-    reference = models.CharField(max_length=100, blank=True)
+    reference = models.CharField(max_length=100, blank=True, db_index=True)
     notes = models.TextField(blank=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         db_table = 'stock_movements'
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+
+class StockHold(models.Model):
+    # Stock set aside for an open POS cart until checkout or expires_at
+    cart = models.CharField(max_length=64)  # Random id chosen by the terminal
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='holds')
+    quantity = models.PositiveIntegerField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        db_table = 'stock_holds'
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='stock_holds_cart_product_uniq'),
+        ]
+        indexes = [
+            # Covers the held-quantity aggregate without touching the table rows
+            models.Index(fields=['product', 'expires_at', 'quantity'], name='stock_holds_product_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for cart {self.cart}"
+
+class Task(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)  # Visibility timeout of a claimed task
+    locked_by = models.CharField(max_length=64, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'tasks'
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='tasks_status_run_after_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
+
+class LowStockAlert(models.Model):
+    # One row per product, reopened on every new crossing of the reorder level
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='low_stock_alert')
+    quantity = models.IntegerField()  # Stock level when the alert was last raised
+    is_open = models.BooleanField(default=True)
+    triggered_at = models.DateTimeField(default=timezone.now)
+    notified_at = models.DateTimeField(null=True, blank=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'low_stock_alerts'
+        indexes = [
+            models.Index(fields=['is_open', 'notified_at'], name='alerts_open_notified_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Low stock: {self.product_id} ({'open' if self.is_open else 'resolved'})"
+
+class ApiToken(models.Model):
+    # Only the SHA-256 of the token is stored, the token itself is shown once
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_tokens')
+    name = models.CharField(max_length=100, blank=True)  # e.g. "Till 3"
+    key_hash = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'api_tokens'
+    
+    def __str__(self):
+        return f"{self.name or 'Token'} ({self.user_id})"
+
+# Archive
+# Closed, fully paid sales older than the archive horizon are moved here by
+# `manage.py archive_sales`, keeping their ids. Foreign keys don't enforce
+# constraints so archived rows survive deleted users and products.
+
+class ArchivedSale(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    invoice_number = models.CharField(max_length=50, unique=True)
+    staff = models.ForeignKey(User, on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    customer_name = models.CharField(max_length=200, blank=True)
+    customer_phone = models.CharField(max_length=15, blank=True)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    payment_status = models.CharField(max_length=20, default='paid')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'archived_sales'
+        indexes = [
+            models.Index(fields=['created_at'], name='archived_sales_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Invoice {self.invoice_number} (archived)"
+
+class ArchivedSaleItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    sale = models.ForeignKey(ArchivedSale, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    product_name = models.CharField(max_length=200)
+    quantity = models.IntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    
+    class Meta:
+        db_table = 'archived_sale_items'
+
+class ArchivedPayment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    sale = models.ForeignKey(ArchivedSale, on_delete=models.CASCADE, related_name='payments')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    payment_method = models.CharField(max_length=50)
+    reference = models.CharField(max_length=100, blank=True)
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    created_by = models.ForeignKey(User, on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    
+    class Meta:
+        db_table = 'archived_payments'
+
+class ArchivedStockMovement(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    movement_type = models.CharField(max_length=20)
+    quantity = models.IntegerField()
+    reference = models.CharField(max_length=100, blank=True, db_index=True)
+    notes = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'archived_stock_movements'
+
+class ArchivedDailyTotal(models.Model):
+    # Per-day totals of archived sales, so reports stay correct without scanning the archive
+    day = models.DateField(unique=True)
+    sales_count = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        db_table = 'archived_daily_totals'
+
+class AuditLog(models.Model):
+    # Append-only: rows are bulk inserted by the audit task and never updated
+    ACTIONS = [
+        ('create', 'Created'),
+        ('update', 'Updated'),
+        ('delete', 'Deleted'),
+    ]
+    object_type = models.CharField(max_length=20)  # 'product', 'sale' or 'payment'
+    object_id = models.BigIntegerField()
+    object_repr = models.CharField(max_length=200)
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    changes = models.JSONField(default=dict)  # field -> [old, new]
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    created_at = models.DateTimeField()  # When the change was made, not when it was written
+    
+    class Meta:
+        db_table = 'audit_log'
+        indexes = [
+            models.Index(fields=['object_type', 'object_id', '-id'], name='audit_object_idx'),
+            models.Index(fields=['user', '-id'], name='audit_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.action} {self.object_type} #{self.object_id}"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Audit log entries cannot be changed')
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError('Audit log entries cannot be deleted')
+
+class DailyClose(models.Model):
+    # Z-report of one business day, frozen when the day is closed
+    day = models.DateField(unique=True)
+    sales_count = models.PositiveIntegerField(default=0)
+    gross = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Before discounts
+    discount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    net = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    collected = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Every payment taken that day
+    credit_issued = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Day's sales left unpaid
+    debt_collected = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Payments on earlier sales
+    by_method = models.JSONField(default=dict)  # payment method -> amount
+    by_staff = models.JSONField(default=list)
+    closed_by = models.ForeignKey(User, on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+')
+    closed_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'daily_closes'
+        ordering = ['-day']
+    
+    def __str__(self):
+        return f"Close of {self.day}"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('A closed day cannot be changed')
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValueError('A closed day cannot be deleted')
+
+class DebtReminder(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    sale = models.ForeignKey(Sale, on_delete=models.CASCADE, related_name='reminders')
+    phone = models.CharField(max_length=20)
+    message = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'debt_reminders'
+        indexes = [
+            # Answers "was this sale reminded recently?" inside the debtor query
+            models.Index(fields=['sale', 'created_at'], name='reminders_sale_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Reminder for sale #{self.sale_id} ({self.status})"
+
+class Promotion(models.Model):
+    KIND_CHOICES = [
+        ('price', 'Price change'),  # value is the new price, kept once it starts
+        ('percent', 'Percentage off'),  # value is the percentage
+        ('bxgy', 'Buy X get Y free'),
+    ]
+    name = models.CharField(max_length=200)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # One product, or every product of a category
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True, related_name='promotions')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='promotions')
+    value = models.DecimalField(max_digits=10, decimal_places=2, default=0, validators=[MinValueValidator(0)])
+    buy_quantity = models.PositiveIntegerField(default=0)
+    free_quantity = models.PositiveIntegerField(default=0)
+    starts_at = models.DateTimeField(default=timezone.now)
+    ends_at = models.DateTimeField(null=True, blank=True)  # Open-ended when empty
+    is_active = models.BooleanField(default=True)
+    applied_at = models.DateTimeField(null=True, blank=True)  # When a price change was written to the product
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'promotions'
+        ordering = ['-starts_at']
+        indexes = [
+            models.Index(fields=['is_active', 'starts_at'], name='promotions_active_start_idx'),
+        ]
+    
+    def __str__(self):
+        return self.name
+
+class EffectivePrice(models.Model):
+    # Price of a product after promotions, rebuilt by prices.py whenever a rule changes
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='effective_price')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    regular_price = models.DecimalField(max_digits=10, decimal_places=2)
+    buy_quantity = models.PositiveIntegerField(default=0)
+    free_quantity = models.PositiveIntegerField(default=0)
+    promotion = models.ForeignKey(Promotion, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    deal = models.ForeignKey(Promotion, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    valid_until = models.DateTimeField(null=True, blank=True, db_index=True)  # Next time a rule starts or ends
+    
+    class Meta:
+        db_table = 'effective_prices'
+    
+    def __str__(self):
+        return f"{self.product_id}: {self.price}"
@@ -0,0 +1,173 @@
+"""Effective prices.
+
+Promotions are rules, and matching them against every search result and
+cart line on each request would not scale. ``refresh()`` evaluates them once
+per product instead and stores the outcome in ``effective_prices``: the unit
+price after the best percentage promotion, the best buy-X-get-Y deal, and
+``valid_until``, the next time a rule of the product starts or ends.
+Checkout and search then read one row per product with ``lookup()``.
+Products whose effective price or deal changes get a new ``updated_at``, so
+the change feed and the API ETags pick them up.
+
+``manage.py refresh_prices`` (run every minute or so from cron) applies due
+price changes, rebuilds the rows whose ``valid_until`` has passed and builds
+the missing ones, i.e. the whole existing catalog on its first run;
+``lookup()`` computes such rows on the fly in the meantime, without writing
+them. A scheduled price change is not a discount: once it starts it
+is written to ``Product.price`` for good.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import caching
+from .models import EffectivePrice, Product, Promotion
+
+CENT = Decimal('0.01')
+CHUNK_SIZE = 2000
+FIELDS = ['price', 'regular_price', 'buy_quantity', 'free_quantity', 'promotion', 'deal', 'valid_until']
+
+
+def current_rules(now):
+    """Discount rules that are running or will run."""
+    return list(
+        Promotion.objects.filter(is_active=True, kind__in=['percent', 'bxgy'])
+        .filter(Q(ends_at__isnull=True) | Q(ends_at__gt=now))
+    )
+
+
+def compute(product_ids, now=None, rules=None):
+    """Unsaved EffectivePrice rows for the given products."""
+    now = now or timezone.now()
+    by_product, by_category = defaultdict(list), defaultdict(list)
+    for rule in current_rules(now) if rules is None else rules:
+        if rule.product_id:
+            by_product[rule.product_id].append(rule)
+        elif rule.category_id:
+            by_category[rule.category_id].append(rule)
+
+    rows = []
+    for pid, price, category_id in Product.objects.filter(id__in=product_ids).values_list('id', 'price', 'category_id'):
+        row = EffectivePrice(product_id=pid, price=price, regular_price=price)
+        boundaries = []
+        for rule in by_product.get(pid, []) + by_category.get(category_id, []):
+            if rule.starts_at > now:
+                boundaries.append(rule.starts_at)
+                continue
+            if rule.ends_at:
+                boundaries.append(rule.ends_at)
+            if rule.kind == 'percent':
+                # Best promotion wins, they don't stack
+                discounted = (price * (100 - min(rule.value, 100)) / 100).quantize(CENT)
+                if discounted < row.price:
+                    row.price, row.promotion = discounted, rule
+            elif rule.buy_quantity and rule.free_quantity:
+                share = Decimal(rule.free_quantity) / (rule.buy_quantity + rule.free_quantity)
+                if row.deal is None or share > Decimal(row.free_quantity) / (row.buy_quantity + row.free_quantity):
+                    row.buy_quantity, row.free_quantity, row.deal = rule.buy_quantity, rule.free_quantity, rule
+        row.valid_until = min(boundaries, default=None)
+        rows.append(row)
+    return rows
+
+
+def refresh(product_ids=None):
+    """Rebuild the effective prices of some products, or of the whole catalog."""
+    now = timezone.now()
+    rules = current_rules(now)
+    # MySQL can't name the conflict target of an upsert: replace the chunk's rows there instead
+    upsert = connections[router.db_for_write(EffectivePrice)].features.supports_update_conflicts_with_target
+    count = 0
+    for chunk in id_chunks(product_ids):
+        rows = compute(chunk, now, rules)
+        current = {
+            pid: offer for pid, *offer in EffectivePrice.objects.filter(product_id__in=chunk)
+            .values_list('product_id', 'price', 'buy_quantity', 'free_quantity')
+        }
+        changed = [row.product_id for row in rows
+                   if current.get(row.product_id) != [row.price, row.buy_quantity, row.free_quantity]]
+        with transaction.atomic():
+            if upsert:
+                EffectivePrice.objects.bulk_create(rows, update_conflicts=True, unique_fields=['product'],
+                                                   update_fields=FIELDS)
+            else:
+                EffectivePrice.objects.filter(product_id__in=chunk).delete()
+                EffectivePrice.objects.bulk_create(rows)
+            if changed:
+                # Stamped per chunk: a long rebuild must not hide behind a sync cursor
+                Product.objects.filter(id__in=changed).update(updated_at=timezone.now())
+        count += len(rows)
+    caching.bump('products')
+    return count
+
+
+def id_chunks(product_ids=None):
+    if product_ids is not None:
+        ids = sorted(set(product_ids))
+        for offset in range(0, len(ids), CHUNK_SIZE):
+            yield ids[offset:offset + CHUNK_SIZE]
+        return
+    last_id = 0
+    while True:
+        chunk = list(Product.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:CHUNK_SIZE])
+        if not chunk:
+            return
+        last_id = chunk[-1]
+        yield chunk
+
+
+def affected_products(promotion):
+    if promotion.product_id:
+        return [promotion.product_id]
+    return list(Product.objects.filter(category_id=promotion.category_id).values_list('id', flat=True))
+
+
+def promotion_changed(promotion):
+    """Reprice what a promotion touches, once the change commits."""
+    transaction.on_commit(lambda: refresh(affected_products(promotion)))
+
+
+def apply_price_changes(now=None):
+    """Write started price changes to their products; returns how many were applied."""
+    now = now or timezone.now()
+    due = Promotion.objects.filter(kind='price', is_active=True, applied_at__isnull=True, starts_at__lte=now,
+                                   product__isnull=False)
+    applied = 0
+    for promotion in due.select_related('product'):
+        with transaction.atomic():
+            # save(), not update(): the change goes through the audit trail and reprices the product
+            product = promotion.product
+            product.price = promotion.value
+            product.save(update_fields=['price', 'updated_at'])
+            Promotion.objects.filter(id=promotion.id).update(applied_at=now)
+        applied += 1
+    return applied
+
+
+def refresh_expired(now=None):
+    """Rebuild the rows a rule started or ended on since they were computed, and build missing ones."""
+    now = now or timezone.now()
+    stale = list(EffectivePrice.objects.filter(valid_until__lte=now).values_list('product_id', flat=True))
+    stale += Product.objects.filter(effective_price__isnull=True).values_list('id', flat=True)
+    return refresh(stale) if stale else 0
+
+
+def lookup(product_ids):
+    """``{product_id: EffectivePrice}`` for the given products, with one query when rows are current."""
+    now = timezone.now()
+    rows = EffectivePrice.objects.in_bulk(product_ids)
+    missing = [pid for pid in product_ids if pid not in rows or (rows[pid].valid_until and rows[pid].valid_until <= now)]
+    if missing:
+        # Not refreshed yet: compute, but leave writing to refresh()
+        rows.update({row.product_id: row for row in compute(missing, now)})
+    return rows
+
+
+def deal_discount(row, quantity):
+    """Value of the free items a buy-X-get-Y deal gives on ``quantity`` units."""
+    if row is None or not row.free_quantity:
+        return Decimal(0)
+    free = quantity // (row.buy_quantity + row.free_quantity) * row.free_quantity
+    return row.price * free
@@ -0,0 +1,119 @@
+"""Live stock levels for POS terminals.
+
+Committed stock changes are published to an in-process broker, coalesced
+for ``COALESCE_SECONDS`` and pushed to every connected terminal as a single
+Server-Sent Event mapping product ids to the quantity still available, i.e.
+not held by carts (null once the product is deleted). Each connection is a
+coroutine waiting on a queue, not a thread, so one ASGI worker holds
+hundreds of terminals.
+
+The broker only sees the changes made by its own process: run one ASGI
+process per terminal group, or put a shared pub/sub behind ``publish()``
+before scaling out.
+"""
+import asyncio
+import json
+from collections import deque
+
+from django.db import transaction
+
+from . import holds
+
+COALESCE_SECONDS = 0.25
+KEEPALIVE_SECONDS = 15
+# Django 4.2 does not notice closed connections while streaming, so every
+# stream ends after a while and EventSource reconnects with Last-Event-ID.
+MAX_STREAM_SECONDS = 300
+RETRY_MILLISECONDS = 2000
+QUEUE_SIZE = 100
+REPLAY_SIZE = 200
+
+
+class Broker:
+    def __init__(self):
+        self.loop = None
+        self.subscribers = set()
+        self.pending = {}
+        self.flush_scheduled = False
+        self.last_id = 0
+        self.recent = deque(maxlen=REPLAY_SIZE)  # (event id, message)
+
+    def subscribe(self, last_event_id=None):
+        self.loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        if last_event_id is not None:
+            oldest = self.recent[0][0] if self.recent else self.last_id + 1
+            if last_event_id > self.last_id or last_event_id < oldest - 1:
+                # Missed events are gone (or come from another process): start over
+                queue.put_nowait('event: resync\ndata: {}\n\n')
+            else:
+                for event_id, message in self.recent:
+                    if event_id > last_event_id:
+                        queue.put_nowait(message)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def publish(self, quantities):
+        """Queue ``{product_id: quantity}`` for the next event. Safe to call from any thread."""
+        loop = self.loop
+        if loop is None or loop.is_closed() or not self.subscribers:
+            return
+        loop.call_soon_threadsafe(self._add, quantities)
+
+    def _add(self, quantities):
+        # Later changes of a product overwrite earlier ones: terminals only need the last value
+        self.pending.update(quantities)
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.loop.call_later(COALESCE_SECONDS, self._flush)
+
+    def _flush(self):
+        self.flush_scheduled = False
+        quantities, self.pending = self.pending, {}
+        self.last_id += 1
+        # Serialized once, whatever the number of terminals
+        message = f"id: {self.last_id}\nevent: stock\ndata: {json.dumps(quantities, separators=(',', ':'))}\n\n"
+        self.recent.append((self.last_id, message))
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # A terminal that stopped reading is cut off; it reconnects and resyncs
+                self.subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+
+broker = Broker()
+
+
+def stock_changed(quantities):
+    """Publish new stock levels once the current transaction commits."""
+    def publish():
+        # Processes without terminals (workers, commands) skip the holds query
+        if broker.subscribers:
+            broker.publish(holds.available(quantities))
+    if quantities:
+        transaction.on_commit(publish)
+
+
+async def stream(last_event_id=None):
+    queue = broker.subscribe(last_event_id)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + MAX_STREAM_SECONDS
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        while loop.time() < deadline:
+            try:
+                message = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                message = ': keepalive\n\n'  # Comment line, keeps proxies from closing the connection
+            if message is None:
+                break
+            yield message
+    finally:
+        broker.unsubscribe(queue)
@@ -0,0 +1,185 @@
+"""Debt reminders.
+
+``due_debtors()`` picks the sales to chase with one query on the
+(payment_status, created_at) index, leaving out those successfully reminded
+within the last ``interval`` days or still being reminded by another run;
+failed sends are tried again on the next run. ``send_reminders()``
+renders every message up front, records them as pending in bulk, sends
+them from a thread pool through the configured transport with retries and
+an optional rate limit, and writes the delivery states back in bulk, one
+chunk at a time.
+
+Transports are classes with a ``send(phone, message)`` method, configured by
+dotted path in ``settings.REMINDER_TRANSPORT`` like Django's email
+backends. A real SMS or WhatsApp gateway only needs such a class; the
+console and file transports below stand in for it locally.
+"""
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import DebtReminder, Sale
+
+# A pending reminder older than this belongs to a run that died, not to one still sending
+IN_FLIGHT = timedelta(hours=1)
+
+# (minimum age in days, template), most overdue first
+TEMPLATES = [
+    (90, "FINAL NOTICE: Dear {customer_name}, invoice {invoice} from {shop} has been unpaid for {days} days. "
+         "Please settle the balance of ₦{balance} immediately."),
+    (30, "Dear {customer_name}, invoice {invoice} from {shop} is {days} days overdue. "
+         "Your outstanding balance is ₦{balance}. Kindly make a payment."),
+    (0, "Hello {customer_name}, a friendly reminder that invoice {invoice} from {shop} has a balance "
+        "of ₦{balance}. Thank you!"),
+]
+
+
+class TransportError(Exception):
+    """A failed send that is worth retrying."""
+
+
+class ConsoleTransport:
+    rate_limit = None  # Messages per second, None for no limit
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+
+    def send(self, phone, message):
+        with self.lock:
+            self.stream.write(f"To {phone}: {message}\n")
+
+
+class FileTransport(ConsoleTransport):
+    """Append messages to ``settings.REMINDER_FILE_PATH``, one line each."""
+
+    def __init__(self):
+        super().__init__(open(getattr(settings, 'REMINDER_FILE_PATH', 'reminders.log'), 'a', encoding='utf-8'))
+
+    def close(self):
+        self.stream.close()
+
+
+def get_transport():
+    return import_string(getattr(settings, 'REMINDER_TRANSPORT', 'inventoryApp.reminders.ConsoleTransport'))()
+
+
+class RateLimiter:
+    """Space calls at least 1/rate seconds apart, across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def due_debtors(min_days=7, min_balance=Decimal(0), interval=7, limit=None):
+    now = timezone.now()
+    reminded = DebtReminder.objects.filter(
+        Q(status='sent', created_at__gte=now - timedelta(days=interval))
+        | Q(status='pending', created_at__gte=now - IN_FLIGHT),
+        sale=OuterRef('pk'),
+    )
+    sales = (
+        Sale.objects.filter(payment_status__in=['unpaid', 'partial'], created_at__lte=now - timedelta(days=min_days),
+                            balance__gt=max(min_balance, Decimal(0)))
+        .exclude(customer_phone='')
+        .filter(~Exists(reminded))
+        .order_by('created_at')
+        .values('id', 'invoice_number', 'customer_name', 'customer_phone', 'balance', 'created_at')
+    )
+    return sales[:limit] if limit else sales
+
+
+def render(sale, now):
+    days = (now - sale['created_at']).days
+    template = next(text for min_age, text in TEMPLATES if days >= min_age)
+    return template.format(
+        customer_name=sale['customer_name'], invoice=sale['invoice_number'], balance=f"{sale['balance']:,.2f}",
+        days=days, shop=getattr(settings, 'REMINDER_SHOP_NAME', 'our shop'),
+    )
+
+
+def deliver(transport, limiter, reminder, retries, backoff):
+    """Send one reminder; runs in a pool thread and touches no database."""
+    for attempt in range(1, retries + 2):
+        limiter.wait()
+        try:
+            transport.send(reminder.phone, reminder.message)
+            reminder.status, reminder.sent_at, reminder.last_error = 'sent', timezone.now(), ''
+            break
+        except TransportError as e:
+            reminder.status, reminder.last_error = 'failed', str(e)
+            if attempt <= retries:
+                time.sleep(backoff * 2 ** (attempt - 1))
+        except Exception as e:
+            # Not retryable: bad number, rejected content...
+            reminder.status, reminder.last_error = 'failed', f"{type(e).__name__}: {e}"
+            break
+    reminder.attempts = attempt
+    return reminder
+
+
+def record_outcomes(reminders):
+    # Nearly every reminder ends the same way, so one UPDATE per outcome is far
+    # cheaper than bulk_update()'s CASE over every row.
+    outcomes = defaultdict(list)
+    for reminder in reminders:
+        outcomes[reminder.status, reminder.attempts, reminder.last_error].append(reminder.pk)
+    sent_at = timezone.now()
+    for (status, attempts, last_error), ids in outcomes.items():
+        DebtReminder.objects.filter(id__in=ids).update(
+            status=status, attempts=attempts, last_error=last_error, sent_at=sent_at if status == 'sent' else None,
+        )
+
+
+def send_reminders(sales, transport=None, workers=8, rate=None, retries=2, backoff=0.5, chunk_size=1000):
+    """Remind the given debtors; returns (sent, failed)."""
+    transport = transport or get_transport()
+    if rate is None:
+        rate = getattr(settings, 'REMINDER_RATE_LIMIT', None) or getattr(transport, 'rate_limit', None)
+    limiter = RateLimiter(rate)
+    now = timezone.now()
+    sent = failed = 0
+    sales = list(sales)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for offset in range(0, len(sales), chunk_size):
+            chunk = sales[offset:offset + chunk_size]
+            # Pending rows first: a crash mid-chunk leaves a trace, and the sale isn't reminded twice
+            reminders = DebtReminder.objects.bulk_create([
+                DebtReminder(sale_id=sale['id'], phone=sale['customer_phone'], message=render(sale, now),
+                             created_at=now)
+                for sale in chunk
+            ])
+            if reminders and reminders[0].pk is None:
+                # MySQL doesn't return the ids of bulk inserted rows; a sale has one reminder per run
+                ids = dict(DebtReminder.objects.filter(created_at=now, sale_id__in=[sale['id'] for sale in chunk])
+                           .values_list('sale_id', 'id'))
+                for reminder in reminders:
+                    reminder.pk = ids[reminder.sale_id]
+            done = list(pool.map(lambda reminder: deliver(transport, limiter, reminder, retries, backoff), reminders))
+            record_outcomes(done)
+            sent += sum(reminder.status == 'sent' for reminder in done)
+            failed += sum(reminder.status == 'failed' for reminder in done)
+    if hasattr(transport, 'close'):
+        transport.close()
+    return sent, failed
@@ -0,0 +1,88 @@
+"""Read-replica routing.
+
+Views decorated with ``@use_replica`` read inventory data from one of the
+aliases in ``settings.DATABASE_REPLICAS``; everything else, and every write,
+goes to ``default``. After any unsafe request (a sale, a payment, a login...)
+the client is pinned to the primary for ``REPLICA_STICKY_SECONDS`` so it
+reads its own writes even if the replicas lag behind.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+STICKY_COOKIE = 'db_primary_until'
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def use_replica(view_func):
+    view_func.use_replica = True
+    return view_func
+
+
+def read_alias():
+    """The alias reads of the current request go to."""
+    return _read_alias.get() or 'default'
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside the block, whatever the view asked for."""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # Sessions and users stay on the primary: a lagging replica must never
+        # log someone out right after they signed in.
+        if model._meta.app_label == 'inventoryApp' and model._meta.label != settings.AUTH_USER_MODEL:
+            return _read_alias.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # All aliases hold the same data
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._replica_alias = None
+        try:
+            response = self.get_response(request)
+        finally:
+            # Worker threads are reused, the alias must not leak into the next request.
+            # set(), not reset(): under ASGI process_view() runs in another context than this.
+            if request._replica_alias is not None:
+                _read_alias.set(None)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            sticky = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+            response.set_cookie(STICKY_COOKIE, str(int(time.time()) + sticky), max_age=sticky,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if replicas and getattr(view_func, 'use_replica', False) and not self.pinned(request):
+            request._replica_alias = random.choice(replicas)
+            _read_alias.set(request._replica_alias)
+        return None
+
+    @staticmethod
+    def pinned(request):
+        try:
+            return int(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
@@ -0,0 +1,93 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from . import audit, auth, caching, prices, realtime
+from .models import User, ApiToken, Product, ProductTombstone, Category, Supplier, Sale, SaleItem, Payment, Promotion
+
+# Cache group bumped when a row of these models changes, see caching.py
+CACHE_GROUPS = {
+    Product: 'products',
+    Category: 'products',
+    Supplier: 'products',
+    Sale: 'sales',
+    SaleItem: 'sales',
+    Payment: 'sales',
+    User: 'staff',
+}
+
+
+@receiver(post_delete, sender=Product)
+def leave_tombstone(sender, instance, **kwargs):
+    ProductTombstone.objects.create(product_id=instance.id, sku=instance.sku)
+
+
+@receiver(post_save, sender=Product)
+def push_stock_level(sender, instance, **kwargs):
+    realtime.stock_changed({instance.id: instance.quantity})
+
+
+@receiver(post_delete, sender=Product)
+def push_product_removed(sender, instance, **kwargs):
+    realtime.stock_changed({instance.id: None})
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_cache_version(sender, **kwargs):
+    group = CACHE_GROUPS.get(sender)
+    if group:
+        caching.bump(group)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    auth.forget_user(instance.pk)
+
+
+@receiver(post_save, sender=ApiToken)
+@receiver(post_delete, sender=ApiToken)
+def forget_cached_token(sender, instance, **kwargs):
+    auth.forget_token(instance.key_hash)
+
+
+@receiver(post_init, sender=Product)
+@receiver(post_init, sender=Sale)
+@receiver(post_init, sender=Payment)
+def remember_audited_values(sender, instance, **kwargs):
+    instance._audit_values = audit.snapshot(instance)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Sale)
+@receiver(post_save, sender=Payment)
+def audit_save(sender, instance, created, **kwargs):
+    audit.saved(instance, created)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Sale)
+@receiver(post_delete, sender=Payment)
+def audit_delete(sender, instance, **kwargs):
+    audit.deleted(instance)
+
+
+@receiver(post_init, sender=Product)
+def remember_pricing(sender, instance, **kwargs):
+    instance._pricing = (instance.__dict__.get('price'), instance.__dict__.get('category_id'))
+
+
+@receiver(post_save, sender=Product)
+def reprice_product(sender, instance, created, **kwargs):
+    # Stock changes leave the effective price alone
+    pricing = (instance.price, instance.category_id)
+    if created or pricing != instance._pricing:
+        instance._pricing = pricing
+        transaction.on_commit(lambda: prices.refresh([instance.id]))
+
+
+@receiver(post_save, sender=Promotion)
+@receiver(post_delete, sender=Promotion)
+def reprice_promotion(sender, instance, **kwargs):
+    prices.promotion_changed(instance)
@@ -0,0 +1,149 @@
+"""Database-backed background tasks.
+
+Tasks are rows in the ``tasks`` table, written in the caller's transaction so
+they only become visible once the sale or payment that produced them commits.
+``python manage.py run_tasks`` claims and executes them.
+"""
+import logging
+import traceback
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task, StockMovement
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(name=None, batch=False):
+    """Register a task handler.
+
+    A batch handler receives the list of payloads of every claimed task with
+    the same name, so like tasks are processed in a single call.
+    """
+    def decorator(func):
+        _registry[name or func.__name__] = (func, batch)
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=5):
+    if name not in _registry:
+        raise ValueError(f'Unknown task: {name}')
+    payload = payload or {}
+    if getattr(settings, 'TASKS_EAGER', False):
+        func, batch = _registry[name]
+
+        def run_now():
+            try:
+                func([payload]) if batch else func(payload)
+            except Exception:
+                # The caller's transaction has committed: a failing task must not fail the request
+                logger.exception('Task %s failed', name)
+        transaction.on_commit(run_now)
+        return None
+    return Task.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def claim(limit=100, visibility_timeout=300):
+    """Lock up to ``limit`` due tasks for this worker.
+
+    Running tasks whose lock has expired (the worker died) are claimed again.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    claimable = Q(run_after__lte=now) & (Q(status='pending') | Q(status='running', locked_until__lt=now))
+    with transaction.atomic():
+        ids = list(
+            Task.objects.filter(claimable)
+            .select_for_update(skip_locked=True)
+            .order_by('run_after')
+            .values_list('id', flat=True)[:limit]
+        )
+        # Re-checking the condition in the UPDATE keeps two workers from
+        # claiming the same rows on backends without row locks (SQLite).
+        Task.objects.filter(claimable, id__in=ids).update(
+            status='running',
+            locked_by=token,
+            locked_until=now + timedelta(seconds=visibility_timeout),
+            attempts=F('attempts') + 1,
+        )
+    return list(Task.objects.filter(locked_by=token, status='running'))
+
+
+def run(tasks):
+    """Execute claimed tasks, grouping like tasks for batch handlers."""
+    groups = defaultdict(list)
+    for t in tasks:
+        groups[t.name].append(t)
+
+    done, failed = [], []
+    for name, group in groups.items():
+        if name not in _registry:
+            failed.extend((t, f'Unknown task: {name}') for t in group)
+            continue
+        func, batch = _registry[name]
+        units = [group] if batch else [[t] for t in group]
+        while units:
+            unit = units.pop()
+            try:
+                with transaction.atomic():
+                    if batch:
+                        func([t.payload for t in unit])
+                    else:
+                        func(unit[0].payload)
+                done.extend(unit)
+            except Exception:
+                if len(unit) > 1:
+                    # Retry one by one so a single bad payload doesn't fail the whole batch
+                    units.extend([t] for t in unit)
+                    continue
+                logger.exception('Task %s failed', name)
+                failed.append((unit[0], traceback.format_exc()))
+
+    Task.objects.filter(id__in=[t.id for t in done]).delete()
+    now = timezone.now()
+    for t, error in failed:
+        if t.attempts >= t.max_attempts:
+            t.status = 'failed'
+        else:
+            t.status = 'pending'
+            t.run_after = now + timedelta(seconds=2 ** t.attempts)  # Exponential backoff
+        t.locked_by = ''
+        t.locked_until = None
+        t.last_error = error
+    Task.objects.bulk_update(
+        [t for t, _ in failed],
+        ['status', 'run_after', 'locked_by', 'locked_until', 'last_error'],
+    )
+    return len(done), len(failed)
+
+
+# Handlers
+
+@task(batch=True)
+def record_stock_movements(payloads):
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            product_id=movement['product_id'],
+            movement_type=movement['movement_type'],
+            quantity=movement['quantity'],
+            reference=movement.get('reference', ''),
+            notes=movement.get('notes', ''),
+            created_by_id=movement.get('created_by_id'),
+        )
+        for payload in payloads
+        for movement in payload['movements']
+    ])
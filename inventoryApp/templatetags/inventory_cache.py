@@ -0,0 +1,43 @@
+from django import template
+from django.core.cache import cache
+
+from inventoryApp import caching
+from inventoryApp.routers import primary
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, nodelist, name, timeout, groups):
+        self.nodelist = nodelist
+        self.name = name
+        self.timeout = timeout
+        self.groups = groups
+
+    def render(self, context):
+        key = caching.make_key(f'fragment:{self.name}', self.groups)
+        html = cache.get(key)
+        caching.record(self.name, html is not None)
+        if html is None:
+            # Lazy querysets of the fragment run here, see caching.py
+            with primary():
+                html = self.nodelist.render(context)
+            cache.set(key, html, self.timeout)
+        return html
+
+
+@register.tag
+def cachedfragment(parser, token):
+    """
+    {% cachedfragment "name" timeout group [group ...] %} ... {% endcachedfragment %}
+
+    Like {% cache %}, but the key follows the versions of the given groups,
+    so the fragment is rebuilt as soon as one of them changes.
+    """
+    bits = token.split_contents()
+    if len(bits) < 4:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes a name, a timeout and at least one group")
+    nodelist = parser.parse(('endcachedfragment',))
+    parser.delete_first_token()
+    name, timeout, groups = bits[1].strip('"\''), int(bits[2]), [g.strip('"\'') for g in bits[3:]]
+    return FragmentNode(nodelist, name, timeout, groups)
@@ -1,3 +1,383 @@
-from django.test import TestCase
+import io
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template import Context, Template
+from django.db import connection, transaction
+from django.test import AsyncClient, TestCase, override_settings
+from django.utils import timezone
+
+from . import archive, caching, closing, holds, prices, reminders, routers, tasks
+from .models import User, AuditLog, Category, Product, Sale, SaleItem, Payment, StockHold, Task, DebtReminder, ArchivedSale, EffectivePrice, Promotion
+from .routers import STICKY_COOKIE, read_alias
+
+
+class ReplicaRoutingTests(TestCase):
+    """Run with ``python manage.py test --settings=inventoryProject.test_settings``."""
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        user = User.objects.create_user(username='cashier', password='x', role='staff')
+        # Different rows on each alias show which one a search read from
+        Product.objects.create(name='Primary Rice', sku='PRI-1', price=10, quantity=5)
+        Product.objects.using('replica1').create(name='Replica Rice', sku='REP-1', price=10, quantity=5)
+        self.client.force_login(user)
+        self.async_client = AsyncClient()
+        self.async_client.force_login(user)
+
+    def names(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.json()]
+
+    def test_wsgi_search_reads_replica(self):
+        response = self.client.get('/api/search-products/', {'q': 'Rice'})
+        self.assertEqual(self.names(response), ['Replica Rice'])
+        self.assertEqual(read_alias(), 'default')
+
+    def test_wsgi_pinned_client_reads_primary(self):
+        self.client.post('/api/cart/release/', {'cart': 'A'})
+        self.assertIn(STICKY_COOKIE, self.client.cookies)
+        response = self.client.get('/api/search-products/', {'q': 'Rice'})
+        self.assertEqual(self.names(response), ['Primary Rice'])
+
+    async def test_asgi_search_reads_replica(self):
+        response = await self.async_client.get('/api/search-products/', {'q': 'Rice'})
+        self.assertEqual(self.names(response), ['Replica Rice'])
+        self.assertEqual(read_alias(), 'default')
+
+    async def test_asgi_pinned_client_reads_primary(self):
+        await self.async_client.post('/api/cart/release/', {'cart': 'A'})
+        self.assertIn(STICKY_COOKIE, self.async_client.cookies)
+        response = await self.async_client.get('/api/search-products/', {'q': 'Rice'})
+        self.assertEqual(self.names(response), ['Primary Rice'])
+
+    def test_cache_is_filled_from_primary(self):
+        cache.clear()
+        fragment = Template('{% load inventory_cache %}{% cachedfragment "names" 60 products %}'
+                            '{% for product in products %}{{ product.name }}{% endfor %}{% endcachedfragment %}')
+        token = routers._read_alias.set('replica1')  # As in a @use_replica view
+        try:
+            names = caching.get_or_set('names', ['products'], lambda: list(Product.objects.values_list('name', flat=True)))
+            html = fragment.render(Context({'products': Product.objects.all()}))
+            self.assertEqual(list(Product.objects.values_list('name', flat=True)), ['Replica Rice'])
+        finally:
+            routers._read_alias.reset(token)
+        self.assertEqual(names, ['Primary Rice'])
+        self.assertEqual(html, 'Primary Rice')
+
+
+@tasks.task(batch=True)
+def flaky_batch(payloads):
+    if any(payload.get('fail') for payload in payloads):
+        raise RuntimeError('bad payload')
+
+
+class TaskQueueTests(TestCase):
+    def test_claim_takes_due_tasks_once(self):
+        due = tasks.enqueue('flaky_batch')
+        tasks.enqueue('flaky_batch', delay=60)
+        self.assertEqual([t.id for t in tasks.claim()], [due.id])
+        self.assertEqual(tasks.claim(), [])
+
+    def test_expired_lock_is_claimed_again(self):
+        task = tasks.enqueue('flaky_batch')
+        tasks.claim(visibility_timeout=60)
+        # The worker died: its lock runs out
+        Task.objects.filter(id=task.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        claimed = tasks.claim()
+        self.assertEqual([t.id for t in claimed], [task.id])
+        self.assertEqual(claimed[0].attempts, 2)
+
+    def test_failure_backs_off_then_gives_up(self):
+        task = tasks.enqueue('flaky_batch', {'fail': True}, max_attempts=2)
+        with self.assertLogs('inventoryApp.tasks', 'ERROR'):
+            self.assertEqual(tasks.run(tasks.claim()), (0, 1))
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'pending')
+        self.assertGreater(task.run_after, timezone.now())
+        self.assertIn('bad payload', task.last_error)
+        self.assertEqual(tasks.claim(), [])
+
+        Task.objects.filter(id=task.id).update(run_after=timezone.now())
+        with self.assertLogs('inventoryApp.tasks', 'ERROR'):
+            self.assertEqual(tasks.run(tasks.claim()), (0, 1))
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'failed')
+
+    def test_bad_payload_does_not_fail_its_batch(self):
+        tasks.enqueue('flaky_batch')
+        bad = tasks.enqueue('flaky_batch', {'fail': True})
+        with self.assertLogs('inventoryApp.tasks', 'ERROR'):
+            self.assertEqual(tasks.run(tasks.claim()), (1, 1))
+        self.assertEqual(list(Task.objects.values_list('id', flat=True)), [bad.id])
+
+
+class AuditTests(TestCase):
+    def test_entry_is_queued_with_the_change(self):
+        product = Product.objects.create(name='Rice', sku='RICE-1', price=10)
+        product.price = 12
+        product.save()
+        self.assertEqual(Task.objects.filter(name='write_audit_log').count(), 2)
+
+        tasks.run(tasks.claim())
+        self.assertEqual(list(AuditLog.objects.order_by('id').values_list('action', flat=True)), ['create', 'update'])
+        self.assertEqual(AuditLog.objects.get(action='update').changes['price'], [10, 12])
+
+    def test_rolled_back_change_leaves_no_entry(self):
+        product = Product.objects.create(name='Rice', sku='RICE-1', price=10)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            product.price = 12
+            product.save()
+            raise RuntimeError('checkout failed')
+        self.assertEqual(Task.objects.filter(name='write_audit_log').count(), 1)
+
+
+class ProcessSaleTests(TestCase):
+    def test_string_product_ids_are_accepted(self):
+        user = User.objects.create_user(username='cashier', password='x', role='staff')
+        product = Product.objects.create(name='Rice', sku='RICE-1', price=10, quantity=5)
+        self.client.force_login(user)
+        response = self.client.post('/api/process-sale/', json.dumps({
+            'items': [{'product_id': str(product.id), 'quantity': 2, 'price': '10', 'discount': '0', 'total': '20'}],
+            'customer_name': 'A', 'customer_phone': '1', 'amount_paid': '20',
+        }), content_type='application/json')
+        self.assertTrue(response.json()['success'], response.json())
+        self.assertEqual(SaleItem.objects.get().quantity, 2)
+        self.assertEqual(Product.objects.get(id=product.id).quantity, 3)
+
+    def test_invoice_numbers_continue_after_archived_sales(self):
+        user = User.objects.create_user(username='cashier', password='x', role='staff')
+        product = Product.objects.create(name='Rice', sku='RICE-1', price=10, quantity=50)
+        self.client.force_login(user)
+
+        def sell(amount_paid):
+            return self.client.post('/api/process-sale/', json.dumps({
+                'items': [{'product_id': product.id, 'quantity': 1, 'price': '10', 'discount': '0', 'total': '10'}],
+                'customer_name': 'A', 'customer_phone': '1', 'amount_paid': amount_paid,
+            }), content_type='application/json').json()['invoice_number']
+
+        sell('0')  # Owed, stays live
+        sell('10')
+        sell('10')
+        Sale.objects.update(created_at=timezone.now() - timedelta(days=800))
+        self.assertEqual(archive.archive_batch(timezone.now() - timedelta(days=365)), 2)
+        self.assertEqual(sell('10'), 'INV-000004')
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class ApiTests(TestCase):
+    def test_renamed_category_changes_etag(self):
+        user = User.objects.create_user(username='boss', password='x', role='admin')
+        category = Category.objects.create(name='Grains')
+        Product.objects.create(name='Rice', sku='RICE-1', price=10, category=category)
+        self.client.force_login(user)
+        params = {'fields': 'name,category_name'}
+        response = self.client.get('/api/products/', params)
+        self.assertIn('Authorization', response['Vary'])
+
+        category.name = 'Cereals'
+        category.save()
+        response = self.client.get('/api/products/', params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['category_name'], 'Cereals')
+
+    @mock.patch('inventoryApp.api.SYNC_SAFETY_LAG', timedelta(0))
+    async def test_asgi_change_feed_streams_chunks(self):
+        await sync_to_async(self.create_catalog)()
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(self.user)
+        with mock.patch('inventoryApp.api.SYNC_CHUNK_SIZE', 2):
+            response = await client.get('/api/products/changes/')
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+        lines = b''.join(chunks).decode().splitlines()
+        self.assertEqual(len(chunks), 3)  # Two chunks of products, then the cursor
+        self.assertEqual(len(lines), 4)
+        self.assertIn('cursor', lines[-1])
+
+    def create_catalog(self):
+        self.user = User.objects.create_user(username='terminal', password='x', role='staff')
+        for i in range(3):
+            Product.objects.create(name=f'Item {i}', sku=f'SKU-{i}', price=10)
+
+
+class StockHoldTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cashier', password='x', role='staff')
+        self.product = Product.objects.create(name='Rice', sku='RICE-1', price=10, quantity=5)
+        self.client.force_login(self.user)
+
+    def hold(self, cart, quantity):
+        return self.client.post('/api/cart/hold/', json.dumps({
+            'cart': cart, 'product_id': self.product.id, 'quantity': quantity,
+        }), content_type='application/json').json()
+
+    def sell(self, cart, quantity):
+        return self.client.post('/api/process-sale/', json.dumps({
+            'items': [{'product_id': self.product.id, 'quantity': quantity, 'price': '10', 'discount': '0',
+                       'total': str(10 * quantity)}],
+            'cart': cart, 'customer_name': 'A', 'customer_phone': '1', 'amount_paid': '0',
+        }), content_type='application/json').json()
+
+    def test_held_stock_is_not_available_to_other_carts(self):
+        self.assertEqual(self.hold('A', 3), {'success': True, 'available': 5})
+        response = self.hold('B', 3)
+        self.assertFalse(response['success'])
+        self.assertIn('Available: 2', response['error'])
+        self.assertFalse(self.sell('B', 3)['success'])
+        # The holding cart itself can still sell everything
+        self.assertEqual(self.hold('A', 5)['available'], 5)
+
+    def test_checkout_releases_the_buyers_holds(self):
+        self.hold('A', 2)
+        self.hold('B', 1)
+        self.assertTrue(self.sell('A', 2)['success'])
+        self.assertEqual(list(StockHold.objects.values_list('cart', flat=True)), ['B'])
+        self.assertEqual(holds.available({self.product.id: 3}), {self.product.id: 2})
+
+    def test_expired_holds_stop_counting(self):
+        self.hold('A', 5)
+        StockHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(holds.available({self.product.id: 5}), {self.product.id: 5})
+        self.assertTrue(self.hold('B', 5)['success'])
+        self.assertEqual(holds.sweep(), 1)
+        self.assertEqual(list(StockHold.objects.values_list('cart', flat=True)), ['B'])
+
+
+class DailyCloseTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cashier', password='x', role='staff')
+        self.day = timezone.localdate() - timedelta(days=1)
+        self.noon = closing.day_range(self.day)[0] + timedelta(hours=12)
+
+    def sale(self, total, created_at):
+        sale = Sale.objects.create(invoice_number=f'INV-{Sale.objects.count() + 1:06d}', staff=self.user,
+                                   customer_name='A', customer_phone='1', subtotal=total, total=total,
+                                   balance=total, payment_status='unpaid')
+        Sale.objects.filter(id=sale.id).update(created_at=created_at)
+        return sale
+
+    def pay(self, sale, amount, method='cash'):
+        payment = Payment.objects.create(sale=sale, amount=amount, payment_method=method, created_by=self.user)
+        Payment.objects.filter(id=payment.id).update(created_at=self.noon)
+
+    def test_credit_issued_and_debt_collected(self):
+        old = self.sale(100, self.noon - timedelta(days=3))
+        new = self.sale(50, self.noon)
+        self.pay(old, 40, 'transfer')  # An earlier debt paid off today
+        self.pay(new, 20)  # 30 of today's sale stays on credit
+
+        result = closing.close_day(self.day, self.user)
+        self.assertEqual(result.sales_count, 1)
+        self.assertEqual(result.net, 50)
+        self.assertEqual(result.collected, 60)
+        self.assertEqual(result.credit_issued, 30)
+        self.assertEqual(result.debt_collected, 40)
+        self.assertEqual(result.by_method, {'cash': '20.00', 'transfer': '40.00'})
+        with self.assertRaisesMessage(ValueError, 'already closed'):
+            closing.close_day(self.day)
+
+    def test_only_finished_unarchived_days_close(self):
+        with self.assertRaisesMessage(ValueError, 'not over yet'):
+            closing.close_day(timezone.localdate())
+        with override_settings(SALES_ARCHIVE_DAYS=30), self.assertRaisesMessage(ValueError, 'may already be archived'):
+            closing.close_day(timezone.localdate() - timedelta(days=31))
+
+
+class DebtReminderTests(TestCase):
+    def test_only_sent_or_in_flight_reminders_hold_a_debtor_back(self):
+        sales = []
+        for i in range(4):
+            sale = Sale.objects.create(invoice_number=f'INV-{i + 1:06d}', customer_name='A', customer_phone='1',
+                                       subtotal=10, total=10, balance=10, payment_status='unpaid')
+            sales.append(sale)
+        Sale.objects.update(created_at=timezone.now() - timedelta(days=30))
+        DebtReminder.objects.create(sale=sales[0], phone='1', message='m', status='sent')
+        DebtReminder.objects.create(sale=sales[1], phone='1', message='m', status='failed')
+        DebtReminder.objects.create(sale=sales[2], phone='1', message='m', status='pending')
+        DebtReminder.objects.create(sale=sales[3], phone='1', message='m', status='pending',
+                                    created_at=timezone.now() - timedelta(hours=2))
+
+        due = [sale['id'] for sale in reminders.due_debtors()]
+        self.assertEqual(due, [sales[1].id, sales[3].id])
+
+
+class ArchiveTests(TestCase):
+    def test_reminded_sale_is_archived(self):
+        sale = Sale.objects.create(invoice_number='INV-000001', customer_name='A', customer_phone='1',
+                                   subtotal=10, discount=0, total=10, amount_paid=10, balance=0,
+                                   payment_status='paid')
+        Sale.objects.filter(id=sale.id).update(created_at=timezone.now() - timedelta(days=800))
+        DebtReminder.objects.create(sale=sale, phone='1', message='Please pay', status='sent')
+
+        self.assertEqual(archive.archive_batch(timezone.now() - timedelta(days=365)), 1)
+        self.assertTrue(ArchivedSale.objects.filter(id=sale.id).exists())
+        self.assertFalse(DebtReminder.objects.exists())
+
+
+class EffectivePriceTests(TestCase):
+    def test_refresh_builds_missing_rows(self):
+        # bulk_create sends no signals, like seed_inventory and products that predate promotions
+        products = Product.objects.bulk_create([Product(name=f'Item {i}', sku=f'SKU-{i}', price=10) for i in range(3)])
+        ids = [product.id for product in products]
+        self.assertFalse(EffectivePrice.objects.exists())
+
+        call_command('refresh_prices', stdout=io.StringIO())
+        self.assertEqual(EffectivePrice.objects.count(), 3)
+        with self.assertNumQueries(1):
+            prices.lookup(ids)
+
+    def test_refresh_without_upsert_target(self):
+        # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target
+        product = Product.objects.create(name='Rice', sku='RICE-1', price=10)
+        prices.refresh([product.id])
+        Promotion.objects.create(name='Rice week', kind='percent', product=product, value=20)
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            self.assertEqual(prices.refresh([product.id]), 1)
+        self.assertEqual(EffectivePrice.objects.get(product=product).price, 8)
+
+    def test_promotion_form_takes_a_product_id(self):
+        user = User.objects.create_user(username='boss', password='x', role='admin')
+        products = Product.objects.bulk_create([Product(name=f'Item {i}', sku=f'SKU-{i}', price=10) for i in range(3)])
+        self.client.force_login(user)
+        response = self.client.get('/promotions/')
+        self.assertNotContains(response, 'Item 1')
+
+        self.client.post('/promotions/', {'name': 'Half off', 'kind': 'percent', 'product': products[1].id,
+                                          'value': 50, 'buy_quantity': 0, 'free_quantity': 0,
+                                          'starts_at': '2026-01-01T00:00'})
+        self.assertEqual(Promotion.objects.get().product_id, products[1].id)
+        response = self.client.post('/promotions/', {'name': 'Typo', 'kind': 'percent', 'product': 999999,
+                                                     'value': 50, 'buy_quantity': 0, 'free_quantity': 0,
+                                          'starts_at': '2026-01-01T00:00'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Promotion.objects.count(), 1)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    @mock.patch('inventoryApp.api.SYNC_SAFETY_LAG', timedelta(0))
+    def test_promotion_reaches_api_and_change_feed(self):
+        user = User.objects.create_user(username='boss', password='x', role='admin')
+        product = Product.objects.create(name='Rice', sku='RICE-1', price=10)
+        prices.refresh([product.id])
+        before = Product.objects.get(id=product.id).updated_at
+        self.client.force_login(user)
+        etag = self.client.get('/api/products/', {'fields': 'effective_price'})['ETag']
+
+        Promotion.objects.create(name='Rice week', kind='percent', product=product, value=20)
+        prices.refresh([product.id])  # What the on_commit receiver does after a real commit
+        self.assertGreater(Product.objects.get(id=product.id).updated_at, before)
+
+        response = self.client.get('/api/products/', {'fields': 'price,effective_price'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{'id': product.id, 'price': '10.00', 'effective_price': '8.00'}])
+        feed = b''.join(self.client.get('/api/products/changes/').streaming_content).decode()
+        self.assertIn('"effective_price":"8.00"', feed)
+
+        # Nothing changed, nothing to resync
+        after = Product.objects.get(id=product.id).updated_at
+        prices.refresh([product.id])
+        self.assertEqual(Product.objects.get(id=product.id).updated_at, after)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, api
 
 urlpatterns = [
     # Auth
@@ -10,6 +10,18 @@ urlpatterns = [
     path('home/', views.home, name='home'),
     path('api/search-products/', views.search_products, name='search_products'),
     path('api/process-sale/', views.process_sale, name='process_sale'),
+    path('api/stock/events/', views.stock_events, name='stock_events'),
+    path('api/cart/hold/', views.hold_stock, name='hold_stock'),
+    path('api/cart/release/', views.release_holds, name='release_holds'),
+    
+    # Read API
+    path('api/products/', api.resource_list, {'resource': 'products'}, name='api_products'),
+    path('api/products/changes/', api.product_changes, name='api_product_changes'),
+    path('api/categories/', api.resource_list, {'resource': 'categories'}, name='api_categories'),
+    path('api/suppliers/', api.resource_list, {'resource': 'suppliers'}, name='api_suppliers'),
+    path('api/sales/', api.resource_list, {'resource': 'sales'}, name='api_sales'),
+    path('api/payments/', api.resource_list, {'resource': 'payments'}, name='api_payments'),
+    path('api/reports/margins/', api.margin_report, name='api_margin_report'),
     path('receipt/<int:sale_id>/', views.view_receipt, name='view_receipt'),
     path('receipt/<int:sale_id>/edit/', views.edit_receipt, name='edit_receipt'),
     
@@ -19,6 +31,10 @@ urlpatterns = [
     # Staff Management
     path('register_staff/', views.register_staff, name='register_staff'),
     path('staff/', views.staff_list, name='staff_list'),
+    path('audit/', views.audit_log, name='audit_log'),
+    path('closing/', views.daily_close, name='daily_close'),
+    path('promotions/', views.promotion_list, name='promotion_list'),
+    path('promotions/<int:pk>/end/', views.end_promotion, name='end_promotion'),
     
     # Products
     path('products/', views.product_list, name='product_list'),
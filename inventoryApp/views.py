@@ -2,13 +2,19 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import Q, Sum, F
-from django.http import JsonResponse, HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-from .models import (User, Product, Supplier, Category, Sale, SaleItem, StockMovement, Payment)
-from .forms import (StaffRegistrationForm, PaymentForm, ProductForm)
+from .models import (User, Product, Supplier, Category, Sale, SaleItem, Payment, ArchivedSale,
+                     AuditLog, StockHold, DailyClose, Promotion)
+from .forms import (StaffRegistrationForm, PaymentForm, ProductForm, PromotionForm)
+from . import tasks, alerts, api, archive, caching, closing, holds, prices, realtime
+from .routers import use_replica
+from asgiref.sync import sync_to_async
 import json
 
 def is_admin(user):
@@ -17,6 +23,9 @@ def is_admin(user):
 def is_staff_or_admin(user):
     return user.is_authenticated and user.role in ['admin', 'staff', 'manager']
 
+def is_manager_or_admin(user):
+    return is_admin(user) or (user.is_authenticated and user.role == 'manager')
+
 # Authentication Views
 def login_view(request):
     if request.user.is_authenticated:
@@ -49,25 +58,30 @@ def home(request):
     return render(request, 'home.html')
 
 # Product Search API
+@use_replica
 @login_required
 def search_products(request):
     query = request.GET.get('q', '')
     if query:
-        products = Product.objects.filter(
+        fields = ['id', 'name', 'sku', 'price', 'quantity', 'image', 'thumbnail']
+        products = api.RESOURCES['products']
+        rows = Product.objects.filter(
             Q(name__icontains=query) | 
             Q(description__icontains=query)
-        )[:20]
-        
-        data = [{
-            'id': p.id,
-            'name': p.name,
-            'sku': p.sku,
-            'price': str(p.price),
-            'quantity': p.quantity,
-            'image': p.image.url if p.image else None
-        } for p in products]
+        ).values(*{products.fields[name] for name in fields})[:20]
+        results = products.serialize(rows, fields)
+        # What other tills have not put in their carts yet
+        available = holds.available({row['id']: row['quantity'] for row in results})
+        offers = prices.lookup([row['id'] for row in results])
+        for row in results:
+            row['available'] = available[row['id']]
+            offer = offers.get(row['id'])
+            if offer:
+                row['regular_price'] = row['price']
+                row['price'] = str(offer.price)
+                row['deal'] = [offer.buy_quantity, offer.free_quantity] if offer.free_quantity else None
         
-        return JsonResponse(data, safe=False)
+        return JsonResponse(results, safe=False)
     return JsonResponse([], safe=False)
 
 # Process Sale
@@ -80,6 +94,7 @@ def process_sale(request):
             customer_name = data.get('customer_name', '').strip()
             customer_phone = data.get('customer_phone', '').strip()
             amount_paid = Decimal(data.get('amount_paid', 0))
+            cart = str(data.get('cart', ''))  # Holds of this cart are ours to sell
             
             if not items:
                 return JsonResponse({'success': False, 'error': 'No items in cart'})
@@ -91,92 +106,136 @@ def process_sale(request):
             if not customer_phone:
                 return JsonResponse({'success': False, 'error': 'Customer phone is required'})
             
-            # Check stock availability for all items BEFORE processing
-            for item in items:
-                try:
-                    product = Product.objects.get(id=item['product_id'])
-                    if product.quantity == 0:
+            # JSON clients may send ids as strings; products below are keyed by int
+            try:
+                for item in items:
+                    item['product_id'] = int(item['product_id'])
+            except (KeyError, TypeError, ValueError):
+                return JsonResponse({'success': False, 'error': 'Product not found'})
+            
+            with transaction.atomic():
+                # Lock every product in the cart with a single query
+                products = Product.objects.select_for_update().in_bulk([item['product_id'] for item in items])
+                # Stock held by other carts is not for sale
+                held = holds.held(list(products), exclude_cart=cart)
+                
+                # Check stock availability for all items BEFORE processing
+                for item in items:
+                    product = products.get(item['product_id'])
+                    if product is None:
+                        return JsonResponse({'success': False, 'error': 'Product not found'})
+                    available = product.quantity - held.get(product.id, 0)
+                    if available <= 0:
                         return JsonResponse({
                             'success': False,
                             'error': f'{product.name} is OUT OF STOCK'
                         })
-                    if product.quantity < item['quantity']:
+                    if available < item['quantity']:
                         return JsonResponse({
                             'success': False, 
-                            'error': f'{product.name} has insufficient stock. Available: {product.quantity}, Requested: {item["quantity"]}'
+                            'error': f'{product.name} has insufficient stock. Available: {available}, Requested: {item["quantity"]}'
                         })
-                except Product.DoesNotExist:
-                    return JsonResponse({'success': False, 'error': 'Product not found'})
-            
-            # Generate invoice number
-            last_sale = Sale.objects.order_by('-id').first()
-            invoice_num = f"INV-{(last_sale.id + 1) if last_sale else 1:06d}"
-            
-            # Calculate totals
-            subtotal = sum(Decimal(item['total']) + Decimal(item['discount']) for item in items)
-            total_discount = sum(Decimal(item['discount']) for item in items)
-            total = subtotal - total_discount
-            balance = total - amount_paid
-            
-            # Determine payment status
-            if balance <= 0:
-                payment_status = 'paid'
-                balance = 0
-            elif amount_paid > 0:
-                payment_status = 'partial'
-            else:
-                payment_status = 'unpaid'
-            
-            # Create sale
-            sale = Sale.objects.create(
-                invoice_number=invoice_num,
-                staff=request.user,
-                customer_name=customer_name,
-                customer_phone=customer_phone,
-                subtotal=subtotal,
-                discount=total_discount,
-                total=total,
-                amount_paid=amount_paid,
-                balance=balance,
-                payment_status=payment_status
-            )
-            
-            # Create sale items and update inventory
-            for item in items:
-                product = Product.objects.get(id=item['product_id'])
                 
-                SaleItem.objects.create(
-                    sale=sale,
-                    product=product,
-                    product_name=product.name,
-                    quantity=item['quantity'],
-                    price=Decimal(item['price']),
-                    discount=Decimal(item['discount']),
-                    total=Decimal(item['total'])
+                # Generate invoice number; archived sales keep their ids, so count them too
+                last_id = max(
+                    Sale.objects.order_by('-id').values_list('id', flat=True).first() or 0,
+                    ArchivedSale.objects.order_by('-id').values_list('id', flat=True).first() or 0,
                 )
+                invoice_num = f"INV-{last_id + 1:06d}"
                 
-                # Update product quantity
-                product.quantity -= item['quantity']
-                product.save()
+                # Price every line from its precomputed effective price, one query for the cart.
+                # The cashier's discount comes on top of promotions.
+                offers = prices.lookup(list(products))
+                lines = []
+                for item in items:
+                    offer = offers.get(item['product_id'])
+                    price = offer.price if offer else products[item['product_id']].price
+                    discount = Decimal(item['discount']) + prices.deal_discount(offer, item['quantity'])
+                    lines.append((item, price, discount))
                 
-                # Record stock movement
-                StockMovement.objects.create(
-                    product=product,
-                    movement_type='out',
-                    quantity=-item['quantity'],
-                    reference=invoice_num,
-                    notes=f'Sale to {customer_name}',
-                    created_by=request.user
-                )
-            
-            # Record payment if any
-            if amount_paid > 0:
-                Payment.objects.create(
-                    sale=sale,
-                    amount=amount_paid,
-                    payment_method='cash',
-                    created_by=request.user
+                # Calculate totals
+                subtotal = sum(price * item['quantity'] for item, price, discount in lines)
+                total_discount = sum(discount for item, price, discount in lines)
+                total = subtotal - total_discount
+                balance = total - amount_paid
+                
+                # Determine payment status
+                if balance <= 0:
+                    payment_status = 'paid'
+                    balance = 0
+                elif amount_paid > 0:
+                    payment_status = 'partial'
+                else:
+                    payment_status = 'unpaid'
+                
+                # Create sale
+                sale = Sale.objects.create(
+                    invoice_number=invoice_num,
+                    staff=request.user,
+                    customer_name=customer_name,
+                    customer_phone=customer_phone,
+                    subtotal=subtotal,
+                    discount=total_discount,
+                    total=total,
+                    amount_paid=amount_paid,
+                    balance=balance,
+                    payment_status=payment_status
                 )
+                
+                # Create sale items and update inventory
+                sale_items = []
+                remaining = {}
+                low_stock = []
+                for item, price, discount in lines:
+                    product = products[item['product_id']]
+                    old_quantity = remaining.get(product.id, product.quantity)
+                    remaining[product.id] = old_quantity - item['quantity']
+                    if alerts.crossed_reorder_level(product, old_quantity, remaining[product.id]):
+                        low_stock.append(product.id)
+                    sale_items.append(SaleItem(
+                        sale=sale,
+                        product=product,
+                        product_name=product.name,
+                        quantity=item['quantity'],
+                        price=price,
+                        discount=discount,
+                        total=(price * item['quantity']) - discount,
+                        unit_cost=product.cost_price
+                    ))
+                    Product.objects.filter(id=product.id).update(
+                        quantity=F('quantity') - item['quantity'],
+                        updated_at=timezone.now()
+                    )
+                SaleItem.objects.bulk_create(sale_items)
+                
+                # Record payment if any
+                if amount_paid > 0:
+                    Payment.objects.create(
+                        sale=sale,
+                        amount=amount_paid,
+                        payment_method='cash',
+                        created_by=request.user
+                    )
+                
+                # Stock movements are bookkeeping only, record them in the background
+                tasks.enqueue('record_stock_movements', {'movements': [{
+                    'product_id': item['product_id'],
+                    'movement_type': 'out',
+                    'quantity': -item['quantity'],
+                    'reference': invoice_num,
+                    'notes': f'Sale to {customer_name}',
+                    'created_by_id': request.user.id,
+                } for item in items]})
+                
+                if low_stock:
+                    tasks.enqueue('open_low_stock_alerts', {'product_ids': low_stock})
+                
+                if cart:
+                    holds.release(cart)
+                
+                # Stock was changed with update(), which sends no signals
+                caching.bump('products')
+                realtime.stock_changed(remaining)
             
             return JsonResponse({
                 'success': True,
@@ -189,31 +248,90 @@ def process_sale(request):
     
     return JsonResponse({'success': False, 'error': 'Invalid request'})
 
+# Cart Holds API
+@login_required
+def hold_stock(request):
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            cart = str(data.get('cart', ''))
+            quantity = int(data.get('quantity', 0))
+            if not cart or quantity < 0:
+                return JsonResponse({'success': False, 'error': 'Invalid cart or quantity'})
+            
+            with transaction.atomic():
+                # Same lock as process_sale, so a hold never races a checkout
+                product = Product.objects.select_for_update().filter(id=data.get('product_id')).first()
+                if product is None:
+                    return JsonResponse({'success': False, 'error': 'Product not found'})
+                try:
+                    available = holds.hold(cart, product, quantity, request.user)
+                except ValueError as e:
+                    return JsonResponse({'success': False, 'error': str(e)})
+                realtime.stock_changed({product.id: product.quantity})
+            
+            return JsonResponse({'success': True, 'available': available})
+        
+        except Exception as e:
+            return JsonResponse({'success': False, 'error': str(e)})
+    
+    return JsonResponse({'success': False, 'error': 'Invalid request'})
+
+@login_required
+def release_holds(request):
+    if request.method == 'POST':
+        # Also sent with navigator.sendBeacon when the POS page is closed, hence the form field
+        cart = request.POST.get('cart', '')
+        if cart:
+            with transaction.atomic():
+                product_ids = list(StockHold.objects.filter(cart=cart).values_list('product_id', flat=True))
+                holds.release(cart)
+                realtime.stock_changed(dict(Product.objects.filter(id__in=product_ids).values_list('id', 'quantity')))
+        return JsonResponse({'success': True})
+    
+    return JsonResponse({'success': False, 'error': 'Invalid request'})
+
+# Live stock levels for the POS (needs ASGI, see realtime.py)
+async def stock_events(request):
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the stream would hold a worker thread; 204 tells EventSource not to retry
+        return HttpResponse(status=204)
+    if not await sync_to_async(is_staff_or_admin)(request.user):
+        return HttpResponse(status=403)
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    response = StreamingHttpResponse(
+        realtime.stream(int(last_event_id) if last_event_id.isdigit() else None),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Proxies must pass events through as they come
+    return response
+
 # Admin Dashboard
+@use_replica
 @login_required
 @user_passes_test(is_admin)
 def admin_dashboard(request):
-    total_products = Product.objects.count()
-    low_stock_products = Product.objects.filter(quantity__lte=F('reorder_level')).count()
-    total_sales = Sale.objects.count()
-    total_revenue = Sale.objects.aggregate(Sum('total'))['total__sum'] or 0
-    debtors_count = Sale.objects.filter(balance__gt=0).count()
+    def counters():
+        archived_count, archived_revenue = archive.archived_totals()
+        return {
+            'total_products': Product.objects.count(),
+            'low_stock_products': Product.objects.filter(quantity__lte=F('reorder_level')).count(),
+            # Archived sales are counted from their daily rollup
+            'total_sales': Sale.objects.count() + archived_count,
+            'total_revenue': (Sale.objects.aggregate(Sum('total'))['total__sum'] or 0) + archived_revenue,
+            'debtors_count': Sale.objects.filter(balance__gt=0).count(),
+        }
     
+    context = caching.get_or_set('dashboard_counters', ['products', 'sales'], counters)
+    
+    # Querysets stay lazy: they only run when their template fragment isn't cached
     # Recent sales
-    recent_sales = Sale.objects.select_related('staff').prefetch_related('items')[:10]
+    context['recent_sales'] = Sale.objects.select_related('staff').prefetch_related('items')[:10]
     
     # Low stock alert
-    low_stock = Product.objects.filter(quantity__lte=F('reorder_level'))[:10]
+    context['low_stock'] = Product.objects.filter(quantity__lte=F('reorder_level'))[:10]
     
-    context = {
-        'total_products': total_products,
-        'low_stock_products': low_stock_products,
-        'total_sales': total_sales,
-        'total_revenue': total_revenue,
-        'debtors_count': debtors_count,
-        'recent_sales': recent_sales,
-        'low_stock': low_stock,
-    }
     return render(request, 'admin_dashboard.html', context)
 
 # Staff Management
@@ -238,6 +356,7 @@ def staff_list(request):
     return render(request, 'staff_list.html', {'staff': staff})
 
 # Product Management
+@use_replica
 @login_required
 @user_passes_test(is_admin)
 def product_list(request):
@@ -251,6 +370,9 @@ def add_product(request):
         form = ProductForm(request.POST, request.FILES)
         if form.is_valid():
             product = form.save()
+            alerts.sync_product(product)
+            if product.image:
+                tasks.enqueue('generate_image_variants', {'product_ids': [product.id]})
             messages.success(request, f'Product {product.name} added successfully!')
             return redirect('product_list')
     else:
@@ -265,7 +387,13 @@ def edit_product(request, pk):
     if request.method == 'POST':
         form = ProductForm(request.POST, request.FILES, instance=product)
         if form.is_valid():
+            if 'image' in form.changed_data:
+                # Old variants belong to the old image
+                product.image_variants = {}
             form.save()
+            alerts.sync_product(product)
+            if 'image' in form.changed_data and product.image:
+                tasks.enqueue('generate_image_variants', {'product_ids': [product.id]})
             messages.success(request, f'Product {product.name} updated successfully!')
             return redirect('product_list')
     else:
@@ -284,6 +412,7 @@ def delete_product(request, pk):
     return render(request, 'product_confirm_delete.html', {'product': product})
 
 # Debtor Management - NOW ACCESSIBLE TO STAFF
+@use_replica
 @login_required
 @user_passes_test(is_staff_or_admin)
 def debtors_list(request):
@@ -347,7 +476,7 @@ def debtor_payment_history(request, sale_id):
 # Receipt Views
 @login_required
 def view_receipt(request, sale_id):
-    sale = get_object_or_404(Sale, id=sale_id)
+    sale = Sale.objects.filter(id=sale_id).first() or get_object_or_404(ArchivedSale, id=sale_id)
     return render(request, 'receipt.html', {'sale': sale})
 
 # New: Edit Receipt View
@@ -374,4 +503,95 @@ def edit_receipt(request, sale_id):
         messages.success(request, 'Receipt updated successfully!')
         return redirect('view_receipt', sale_id=sale.id)
     
-    return render(request, 'edit_receipt.html', {'sale': sale})
\ No newline at end of file
+    return render(request, 'edit_receipt.html', {'sale': sale})
+
+# Audit Trail
+@use_replica
+@login_required
+@user_passes_test(is_admin)
+def audit_log(request):
+    entries = AuditLog.objects.select_related('user').order_by('-id')
+    object_type = request.GET.get('type', '')
+    object_id = request.GET.get('id', '')
+    user_id = request.GET.get('user', '')
+    if object_type:
+        entries = entries.filter(object_type=object_type)
+    if object_id.isdigit():
+        entries = entries.filter(object_id=object_id)
+    if user_id.isdigit():
+        entries = entries.filter(user_id=user_id)
+    # Keyset pagination: the table only grows, OFFSET and COUNT would get slower forever
+    before = request.GET.get('before', '')
+    if before.isdigit():
+        entries = entries.filter(id__lt=before)
+    page = list(entries[:51])
+
+    context = {
+        'entries': page[:50],
+        'next_before': page[49].id if len(page) > 50 else None,
+        'object_type': object_type,
+        'object_id': object_id,
+        'user_id': user_id,
+        'staff': User.objects.order_by('username').only('id', 'username'),
+    }
+    return render(request, 'audit_log.html', context)
+
+# End of Day
+@login_required
+@user_passes_test(is_manager_or_admin)
+def daily_close(request):
+    try:
+        day = date.fromisoformat(request.GET.get('day', '')) if request.GET.get('day') else timezone.localdate()
+    except ValueError:
+        day = timezone.localdate()
+    
+    if request.method == 'POST':
+        try:
+            closing.close_day(day, request.user)
+            messages.success(request, f'{day} closed successfully!')
+        except ValueError as e:
+            messages.error(request, str(e))
+        return redirect(f"{request.path}?day={day.isoformat()}")
+    
+    # A closed day is read back as stored, never recomputed
+    closed = DailyClose.objects.filter(day=day).select_related('closed_by').first()
+    context = {
+        'day': day,
+        'closed': closed,
+        'report': closed or closing.report(day),
+        'can_close': closed is None and closing.can_close(day) is None,
+        'recent': DailyClose.objects.only('day', 'sales_count', 'net', 'collected')[:14],
+    }
+    return render(request, 'daily_close.html', context)
+
+# Promotions
+@login_required
+@user_passes_test(is_admin)
+def promotion_list(request):
+    if request.method == 'POST':
+        form = PromotionForm(request.POST)
+        if form.is_valid():
+            promotion = form.save(commit=False)
+            promotion.created_by = request.user
+            promotion.save()
+            messages.success(request, f'Promotion {promotion.name} saved successfully!')
+            return redirect('promotion_list')
+    else:
+        form = PromotionForm()
+    
+    promotions = Promotion.objects.select_related('product', 'category', 'created_by').filter(
+        Q(ends_at__isnull=True) | Q(ends_at__gt=timezone.now() - timedelta(days=30))
+    )
+    return render(request, 'promotions.html', {'form': form, 'promotions': promotions, 'now': timezone.now()})
+
+@login_required
+@user_passes_test(is_admin)
+def end_promotion(request, pk):
+    promotion = get_object_or_404(Promotion, pk=pk)
+    if request.method == 'POST' and promotion.is_active:
+        # Ended rather than deleted, so past sales can still be explained
+        promotion.is_active = False
+        promotion.ends_at = min(promotion.ends_at or timezone.now(), timezone.now())
+        promotion.save(update_fields=['is_active', 'ends_at'])
+        messages.success(request, f'Promotion {promotion.name} ended.')
+    return redirect('promotion_list')
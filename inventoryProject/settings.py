@@ -47,12 +47,21 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'inventoryApp.auth.TokenAuthenticationMiddleware',
+    'inventoryApp.routers.ReplicaRoutingMiddleware',
+    'inventoryApp.audit.AuditMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'inventoryProject.urls'
 AUTH_USER_MODEL = 'inventoryApp.User'
+# Serves request.user from the cache instead of one query per request
+AUTHENTICATION_BACKENDS = ['inventoryApp.auth.CachedModelBackend']
+
+# Sessions are read from the cache and written through to the database;
+# set SESSION_ENGINE=django.contrib.sessions.backends.signed_cookies to avoid both
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
 
 TEMPLATES = [
     {
@@ -93,9 +102,42 @@ DATABASES = {
         'PORT': '3306',
         "OPTIONS":{
             'autocommit':True
-        }
+        },
+        # Keep connections open between requests instead of reconnecting every time
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=300, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+# Read replicas: comma separated hosts, each becomes a "replicaN" alias.
+# Views marked with @use_replica read from them, see inventoryApp/routers.py
+DATABASE_REPLICAS = []
+for i, host in enumerate(config('DB_REPLICA_HOSTS', default='', cast=lambda v: [h.strip() for h in v.split(',') if h.strip()]), 1):
+    DATABASES[f'replica{i}'] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{i}')
+
+DATABASE_ROUTERS = ['inventoryApp.routers.ReplicaRouter']
+
+# Cache
+# CACHE_BACKEND is locmem (per process), file (CACHE_LOCATION is a directory)
+# or redis (CACHE_LOCATION is a redis:// URL, needs the redis package).
+# Version bumps from `run_tasks`, `archive_sales` and the other web workers must reach
+# every process, so locmem is only the default with DEBUG; production defaults to file.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[config('CACHE_BACKEND', default='locmem' if DEBUG else 'file')],
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'cache')),
+        'KEY_PREFIX': 'inventory',
+        'TIMEOUT': 300,
     }
 }
+# Seconds a client keeps reading from the primary after it wrote something
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=5, cast=int)
 
 
 # Password validation
@@ -142,6 +184,32 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Background tasks
+# Run task handlers right after commit instead of queueing them for `manage.py run_tasks`
+TASKS_EAGER = config('TASKS_EAGER', default=False, cast=bool)
+
+# Low-stock alerts
+# Digest recipients; defaults to the emails of active admin and manager users
+LOW_STOCK_ALERT_EMAILS = config('LOW_STOCK_ALERT_EMAILS', default='', cast=lambda v: [e.strip() for e in v.split(',') if e.strip()])
+# A product that goes back under its reorder level within this many seconds of a digest is not reported again
+LOW_STOCK_ALERT_DEBOUNCE = config('LOW_STOCK_ALERT_DEBOUNCE', default=6 * 60 * 60, cast=int)
+
+# Cart holds
+# Seconds a cart keeps its stock held without activity, see holds.py
+CART_HOLD_SECONDS = config('CART_HOLD_SECONDS', default=300, cast=int)
+
+# Debt reminders
+# Dotted path of the class sending reminders, see reminders.py
+REMINDER_TRANSPORT = config('REMINDER_TRANSPORT', default='inventoryApp.reminders.ConsoleTransport')
+REMINDER_FILE_PATH = config('REMINDER_FILE_PATH', default=str(BASE_DIR / 'reminders.log'))
+# Messages per second across all sender threads; 0 uses the transport's own limit
+REMINDER_RATE_LIMIT = config('REMINDER_RATE_LIMIT', default=0, cast=float)
+REMINDER_SHOP_NAME = config('REMINDER_SHOP_NAME', default='our shop')
+
+# Archive
+# Fully paid sales older than this many days are moved to the archive tables by `manage.py archive_sales`
+SALES_ARCHIVE_DAYS = config('SALES_ARCHIVE_DAYS', default=365, cast=int)
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'login'
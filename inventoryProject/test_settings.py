@@ -0,0 +1,21 @@
+"""Settings for `python manage.py test --settings=inventoryProject.test_settings`.
+
+Two SQLite databases stand in for the MySQL primary and a read replica.
+"""
+import os
+
+os.environ.setdefault('SECRET_KEY', 'test')
+os.environ.setdefault('DEBUG', 'True')
+
+from .settings import *  # noqa: E402,F401,F403
+
+DATABASES = {
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'test_default.sqlite3'},
+    'replica1': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'test_replica1.sqlite3'},
+}
+DATABASE_REPLICAS = ['replica1']
+
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# Tests run in a single process, locmem is shared by everything they do
+SILENCED_SYSTEM_CHECKS = ['inventoryApp.E001']
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']